@@ -0,0 +1,207 @@
+# batch.py
+"""
+Headless batch runner: analyze every PDF CV in a directory, search jobs for
+the suggested titles and pick the best matches, writing one JSON line per CV.
+
+    python batch.py CV_DIR -o results.jsonl [--workers 4] [--concurrency 4]
+
+Re-running with the same output file skips CVs already written successfully
+(same path and content hash), so an interrupted run resumes where it stopped.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from utils.ai_advice import analyze_cv, match_jobs_with_ai
+from utils.job_search import search_linkedin_jobs, search_bayt_jobs
+from utils.jobs import JobTable
+
+
+def _init_worker():
+    # Each worker extracts one CV at a time; no nested page-parallel pool
+    from utils import cv_ingest
+    cv_ingest.PARALLEL_MIN_PAGES = 0
+
+
+def _extract(path: str) -> dict:
+    """Runs in a worker process."""
+    from utils.cv_ingest import extract_cv_text
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        parsed = extract_cv_text(data)
+    except Exception as e:
+        return {"sha256": hashlib.sha256(data).hexdigest(), "error": f"{type(e).__name__}: {e}"}
+    return {"sha256": parsed["sha256"], "text": parsed["text"], "pages": parsed["pages"]}
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _title_key(title: str) -> str:
+    return " ".join(title.lower().split())
+
+
+def _load_done(output: str) -> set:
+    """(file, sha256) of every CV already written with status "ok"."""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if record.get("status") == "ok":
+                done.add((record["file"], record["sha256"]))
+    return done
+
+
+class TitleSearches:
+    """
+    One job search per distinct title across the whole batch: the first CV
+    that suggests a title starts its search; later CVs wait for the same result.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, num_results: int):
+        self.executor = executor
+        self.num_results = num_results
+        self.searches = {}
+        self._lock = threading.Lock()
+
+    def _search(self, title: str) -> JobTable:
+        return JobTable(search_linkedin_jobs([title], self.num_results) + search_bayt_jobs([title], self.num_results))
+
+    def get(self, title: str) -> JobTable:
+        key = _title_key(title)
+        with self._lock:
+            future = self.searches.get(key)
+            if future is None:
+                future = self.searches[key] = self.executor.submit(self._search, title)
+        return future.result()
+
+
+def _match_record(match) -> dict:
+    job = match.job
+    return {
+        "title": job.title,
+        "link": job.link,
+        "source": job.source,
+        "location": job.location,
+        "type": job.type,
+        "score": match.score,
+        "reason": match.reason,
+    }
+
+
+def process_cv(name: str, extracted: dict, searches: TitleSearches, titles_per_cv: int, top_n: int) -> dict:
+    """Analysis, search and matching for one extracted CV. Never raises."""
+    started = time.perf_counter()
+    record = {"file": name, "sha256": extracted["sha256"]}
+    if extracted.get("error"):
+        return {**record, "status": "error", "stage": "extract", "error": extracted["error"]}
+    record["pages"] = extracted["pages"]
+    try:
+        analysis = analyze_cv(extracted["text"])
+        if analysis.get("error"):
+            return {**record, "status": "error", "stage": "analyze", "error": analysis["error"]}
+        record["job_titles"] = analysis["job_titles"]
+        record["advice"] = analysis["advice_bullets"]
+        record["searches"] = []
+        for title in analysis["job_titles"][:titles_per_cv]:
+            jobs = searches.get(title).jobs()
+            entry = {"title": title, "jobs": len(jobs), "matches": []}
+            if jobs:
+                result = match_jobs_with_ai(extracted["text"], title, jobs, top_n=top_n)
+                entry["matches"] = [_match_record(m) for m in result.get("matches", [])]
+                entry["ranking"] = result.get("ranking", "ai")
+            record["searches"].append(entry)
+    except Exception as e:
+        return {**record, "status": "error", "stage": "search", "error": f"{type(e).__name__}: {e}"}
+    record["status"] = "ok"
+    record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
+def run(cv_dir: str, output: str, workers: int, concurrency: int, num_results: int,
+        titles_per_cv: int, top_n: int) -> dict:
+    paths = sorted(
+        os.path.join(root, f)
+        for root, _, files in os.walk(cv_dir)
+        for f in files if f.lower().endswith(".pdf")
+    )
+    done = _load_done(output)
+    todo = []
+    for path in paths:
+        name = os.path.relpath(path, cv_dir)
+        if (name, _file_hash(path)) not in done:
+            todo.append((name, path))
+    counts = {"total": len(paths), "skipped": len(paths) - len(todo), "ok": 0, "error": 0}
+    print(f"{len(paths)} CVs, {counts['skipped']} already done, {len(todo)} to process", file=sys.stderr)
+    if not todo:
+        return counts
+
+    # PDFs in processes; analysis, searches and matching in threads (network-bound)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pdf_pool, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-cv") as cv_pool, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-search") as search_pool, \
+            open(output, "a", encoding="utf-8") as out:
+        searches = TitleSearches(search_pool, num_results)
+        extracting = {pdf_pool.submit(_extract, path): name for name, path in todo}
+        processing = set()
+        while extracting or processing:
+            finished, _ = wait(set(extracting) | processing, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in extracting:
+                    name = extracting.pop(future)
+                    try:
+                        extracted = future.result()
+                    except Exception as e:
+                        extracted = {"sha256": None, "error": f"{type(e).__name__}: {e}"}
+                    processing.add(cv_pool.submit(process_cv, name, extracted, searches, titles_per_cv, top_n))
+                    continue
+                processing.discard(future)
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                counts[record["status"]] += 1
+                n = counts["ok"] + counts["error"]
+                detail = f"{len(record.get('job_titles', []))} titles" if record["status"] == "ok" else record["error"]
+                print(f"[{n}/{len(todo)}] {record['file']}: {record['status']} ({detail})", file=sys.stderr)
+    counts["titles_searched"] = len(searches.searches)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("cv_dir", help="directory of PDF CVs (searched recursively)")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL file to append results to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="PDF extraction processes")
+    parser.add_argument("--concurrency", type=int, default=4, help="CVs and searches in flight at once")
+    parser.add_argument("--num-results", type=int, default=5, help="jobs per source per title")
+    parser.add_argument("--titles-per-cv", type=int, default=1, help="suggested titles searched per CV")
+    parser.add_argument("--top-n", type=int, default=3, help="matches kept per title")
+    args = parser.parse_args()
+    if not os.path.isdir(args.cv_dir):
+        parser.error(f"not a directory: {args.cv_dir}")
+
+    started = time.perf_counter()
+    counts = run(args.cv_dir, args.output, args.workers, args.concurrency, args.num_results,
+                 args.titles_per_cv, args.top_n)
+    print(f"Done in {time.perf_counter() - started:.1f}s: {json.dumps(counts)}", file=sys.stderr)
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# bench_memory.py
+"""
+Memory held per session for search results: list of job dicts (the old
+st.session_state.jobs) vs. list of Job objects vs. a JobTable (the same
+Job objects plus its duplicate check).
+
+    python -m benchmarks.bench_memory [--jobs 30] [--sessions 100]
+"""
+import os
+import sys
+import gc
+import json
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.job_search import parse_items_batch  # noqa: E402
+from utils.jobs import Job, JobTable  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "cse_responses.json")
+SOURCES = ["LinkedIn", "Bayt"]
+
+
+def load_records() -> list[dict]:
+    with open(FIXTURE, encoding="utf-8") as f:
+        pages = [page.get("items", []) for page in json.load(f)]
+    records = []
+    for n, items in enumerate(pages):
+        for record in parse_items_batch(items):
+            record["source"] = SOURCES[n % 2]
+            records.append(record)
+    return records
+
+
+def session_records(records: list[dict], session: int, count: int) -> list[dict]:
+    # Fresh strings per session, like results decoded from separate responses
+    out = []
+    for i in range(count):
+        r = records[(session + i) % len(records)]
+        out.append({
+            "title": "".join(r["title"]),
+            "link": f"{r['link']}?s={session}",
+            "desc": "".join(r["desc"]),
+            "location": "".join(r["location"]),
+            "type": "".join(r["type"]),
+            "date": r["date"].replace(),
+            "source": "".join(r["source"]),
+        })
+    return out
+
+
+def measure(build, records: list[dict], sessions: int, count: int) -> int:
+    """Bytes still allocated after building and keeping one result set per session."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [build(session_records(records, s, count)) for s in range(sessions)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=30, help="jobs per session")
+    parser.add_argument("--sessions", type=int, default=100)
+    args = parser.parse_args()
+
+    records = load_records()
+    variants = {
+        "dicts": lambda rs: list(rs),
+        "Job objects": lambda rs: [Job.from_record(r) for r in rs],
+        "JobTable": JobTable,
+    }
+    print(f"{args.sessions} sessions x {args.jobs} jobs")
+    baseline = None
+    for name, build in variants.items():
+        size = measure(build, records, args.sessions, args.jobs)
+        baseline = baseline or size
+        print(f"{name:12}: {size / args.sessions / 1024:8.1f} KiB/session  ({size / baseline:.0%})")
+
+
+if __name__ == "__main__":
+    main()
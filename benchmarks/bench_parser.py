@@ -0,0 +1,86 @@
+# bench_parser.py
+"""
+Micro-benchmark of CSE item parsing: per-item clean_title/parse_snippet_fields
+vs. parse_items_batch, on the saved responses in fixtures/cse_responses.json.
+
+    python -m benchmarks.bench_parser [--repeat 200]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.job_search import clean_title, parse_snippet_fields, parse_items_batch  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "cse_responses.json")
+
+
+def load_pages() -> list[list[dict]]:
+    with open(FIXTURE, encoding="utf-8") as f:
+        return [page.get("items", []) for page in json.load(f)]
+
+
+def parse_per_item(items: list[dict]) -> list[dict]:
+    records = []
+    for item in items:
+        fields = parse_snippet_fields(item.get("snippet", ""), item.get("title", ""))
+        records.append({
+            "title": clean_title(item.get("title", "")),
+            "link": item.get("link"),
+            "desc": item.get("snippet", ""),
+            "location": fields["location"],
+            "type": fields["type"],
+            "date": fields["date"],
+        })
+    return records
+
+
+def check_equivalent(pages: list[list[dict]]) -> int:
+    """Both parsers must agree on every field (dates to the day). Returns mismatches."""
+    mismatches = 0
+    for items in pages:
+        for old, new in zip(parse_per_item(items), parse_items_batch(items)):
+            for field in ("title", "link", "desc", "location", "type"):
+                if old[field] != new[field]:
+                    mismatches += 1
+                    print(f"  {field}: {old[field]!r} != {new[field]!r}")
+            if abs((old["date"] - new["date"]).total_seconds()) > 60:
+                mismatches += 1
+                print(f"  date: {old['date']} != {new['date']}")
+    return mismatches
+
+
+def bench(fn, pages: list[list[dict]], repeat: int) -> float:
+    """Items per second for `fn` applied page by page."""
+    count = sum(len(items) for items in pages) * repeat
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for items in pages:
+            fn(items)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = load_pages()
+    total = sum(len(items) for items in pages)
+    print(f"Corpus: {len(pages)} pages, {total} items, x{args.repeat}")
+
+    mismatches = check_equivalent(pages)
+    print(f"Equivalence: {'ok' if not mismatches else f'{mismatches} mismatches'}")
+
+    before = bench(parse_per_item, pages, args.repeat)
+    after = bench(parse_items_batch, pages, args.repeat)
+    print(f"per-item : {before:12,.0f} items/s")
+    print(f"batch    : {after:12,.0f} items/s  ({after / before:.2f}x)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
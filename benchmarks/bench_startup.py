@@ -0,0 +1,91 @@
+# bench_startup.py
+"""
+Cold-start benchmark: time to import what main.py imports from utils, and
+time of the first AppTest render of main.py, each in a fresh interpreter.
+Also lists which heavy optional modules got loaded along the way.
+
+    python -m benchmarks.bench_startup [--repeat 5] [--max-import-ms N] [--max-render-ms N]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Should only be imported when their feature is used
+HEAVY_MODULES = ["fitz", "PIL", "streamlit_lottie", "numpy"]
+
+IMPORT_SNIPPET = """
+import sys, time, json
+started = time.perf_counter()
+from utils.ai_advice import analyze_cv_stream, match_jobs_with_ai_stream
+from utils.job_search import search_all_jobs
+from utils.jobs import JobTable
+from utils.cards import render_job_cards
+from utils.cv_ingest import extract_cv_text
+from utils.lottie import load_lottie
+elapsed = time.perf_counter() - started
+print(json.dumps({"ms": elapsed * 1000, "loaded": [m for m in HEAVY if m in sys.modules]}))
+"""
+
+RENDER_SNIPPET = """
+import os, sys, time, json, tempfile
+os.environ["MASARAK_CACHE_DIR"] = tempfile.mkdtemp()
+os.environ["LOTTIE_REFRESH"] = "0"
+from streamlit.testing.v1 import AppTest
+before = set(m for m in HEAVY if m in sys.modules)
+at = AppTest.from_file("main.py", default_timeout=60)
+started = time.perf_counter()
+at.run()
+elapsed = time.perf_counter() - started
+print(json.dumps({"ms": elapsed * 1000, "loaded": [m for m in HEAVY if m in sys.modules and m not in before],
+                  "errors": len(at.exception)}))
+"""
+
+
+def run_fresh(snippet: str) -> dict:
+    code = f"HEAVY = {HEAVY_MODULES!r}\n{snippet}"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": ROOT},
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(snippet: str, repeat: int) -> dict:
+    runs = [run_fresh(snippet) for _ in range(repeat)]
+    return {
+        "median_ms": statistics.median(r["ms"] for r in runs),
+        "loaded": sorted(set().union(*(r["loaded"] for r in runs))),
+        "errors": max(r.get("errors", 0) for r in runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time is above this")
+    parser.add_argument("--max-render-ms", type=float, help="fail if the median first render is above this")
+    args = parser.parse_args()
+
+    imports = measure(IMPORT_SNIPPET, args.repeat)
+    render = measure(RENDER_SNIPPET, args.repeat)
+    print(f"utils imports : {imports['median_ms']:8.1f} ms  heavy loaded: {', '.join(imports['loaded']) or '-'}")
+    print(f"first render  : {render['median_ms']:8.1f} ms  heavy loaded: {', '.join(render['loaded']) or '-'}"
+          f"{'  (app raised ' + str(render['errors']) + ' exceptions)' if render['errors'] else ''}")
+
+    failed = render["errors"] > 0
+    if args.max_import_ms and imports["median_ms"] > args.max_import_ms:
+        print(f"Import time above {args.max_import_ms} ms")
+        failed = True
+    if args.max_render_ms and render["median_ms"] > args.max_render_ms:
+        print(f"First render above {args.max_render_ms} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+# bench_suite.py
+"""
+Offline end-to-end benchmark suite against the local stand-in servers
+(fake_server.py): job search latency (cold and cached), Gemini call latency
+(analysis, streamed analysis, matching, hedging a slow model), CV context
+caching, parser throughput and memory per session. Needs no network or API keys.
+
+    python -m benchmarks.bench_suite [--latency-ms 200] [--error-rate 0.05] [--repeat 5] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_server import FakeConfig, start_server  # noqa: E402
+
+SAMPLE_CV = """Jane Doe - Data Analyst, Beirut, Lebanon
+Summary
+Data analyst with 4 years of experience in Python, SQL and Power BI.
+Experience
+Data Analyst at a Lebanese bank: built SQL reporting pipelines and dashboards.
+Junior Python Developer: automated data cleaning scripts with pandas.
+Skills
+Python, SQL, pandas, Power BI, Excel, statistics, data visualization
+Education
+BSc Computer Science, American University of Beirut
+"""
+SEARCH_TITLES = ["Data Analyst", "Python Developer", "Software Engineer"]
+
+
+def configure_env(base_url: str) -> None:
+    """Point the app at the stand-in servers. Must run before utils is imported."""
+    os.environ.update({
+        "CSE_BASE_URL": base_url,
+        "GEMINI_BASE_URL": base_url,
+        "GEMINI_API_KEY": "offline-benchmark",
+        "GOOGLE_API_KEY": "offline-benchmark",
+        "GOOGLE_CX": "offline-benchmark",
+        "MASARAK_CACHE_DIR": tempfile.mkdtemp(prefix="masarak-bench-"),
+        "USE_JOB_INDEX": "0",
+        "CSE_DAILY_BUDGET": "0",
+        # Time the calls, not the default rate limits
+        "CSE_RATE_PER_SEC": "0",
+        "GEMINI_RATE_PER_MIN": "0",
+    })
+
+
+def timed(fn, repeat: int, setup=None) -> dict:
+    """Median/p95/min of `fn()` in ms over `repeat` runs; `setup()` runs untimed first."""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0],
+    }
+
+
+def bench_search(repeat: int) -> dict:
+    from utils import job_search
+    from utils.prefetch import Prefetcher
+
+    def search():
+        for title in SEARCH_TITLES:
+            job_search.search_all_jobs([title], num_results=15)
+
+    prefetcher = None
+
+    def prefetch():
+        # Cold cache, then the user reads the advice while every title is prefetched
+        nonlocal prefetcher
+        job_search.CSE_CACHE.clear()
+        prefetcher = Prefetcher(workers=2, ttl=900, max_entries=100)
+        prefetcher.prefetch(SEARCH_TITLES, 15)
+        prefetcher.wait()
+
+    return {
+        "search cold (3 titles x 2 sources)": timed(search, repeat, setup=job_search.CSE_CACHE.clear),
+        "search cached": timed(search, repeat),
+        "search after prefetch (1 title)": timed(lambda: prefetcher.search(SEARCH_TITLES[1], 15), repeat, setup=prefetch),
+    }
+
+
+def bench_ai(repeat: int) -> dict:
+    from utils import ai_advice, job_search
+    from utils.jobs import JobTable
+
+    def clear_analysis():
+        ai_advice.ANALYSIS_CACHE.clear()
+        ai_advice.ANALYSIS_DISK_CACHE.clear()
+
+    first_advice = []
+
+    def stream():
+        started = time.perf_counter()
+        first = None
+        for event in ai_advice.analyze_cv_stream(SAMPLE_CV):
+            if event["event"] == "advice" and first is None:
+                first = (time.perf_counter() - started) * 1000
+        if first is not None:
+            first_advice.append(first)
+
+    jobs = JobTable(job_search.search_all_jobs(["Data Analyst"], num_results=15)).jobs()
+    results = {
+        "analyze_cv": timed(lambda: ai_advice.analyze_cv(SAMPLE_CV), repeat, setup=clear_analysis),
+        "analyze_cv_stream (total)": timed(stream, repeat, setup=clear_analysis),
+        "match_jobs_with_ai": timed(
+            lambda: ai_advice.match_jobs_with_ai(SAMPLE_CV, "Data Analyst", jobs, top_n=3),
+            repeat, setup=ai_advice.MATCH_CACHE.clear,
+        ),
+        "match_jobs_with_ai cached": timed(
+            lambda: ai_advice.match_jobs_with_ai(SAMPLE_CV, "Data Analyst", jobs, top_n=3), repeat,
+        ),
+    }
+    if first_advice:
+        results["analyze_cv_stream (first advice)"] = {
+            "median_ms": statistics.median(first_advice), "p95_ms": max(first_advice), "min_ms": min(first_advice),
+        }
+    return results
+
+
+def bench_hedge(server, repeat: int, slow_ms: float = 2000, deadline: float = 0.5) -> dict:
+    """analyze_cv while its model answers `slow_ms` late, without and with a hedged fallback."""
+    from utils import ai_advice
+
+    def clear_analysis():
+        ai_advice.ANALYSIS_CACHE.clear()
+        ai_advice.ANALYSIS_DISK_CACHE.clear()
+
+    gemini = server.config["gemini"]
+    fallback, deadlines = ai_advice.FALLBACK_MODEL, dict(ai_advice.TASK_DEADLINES)
+    gemini.model_latency_ms = {ai_advice.TASK_MODELS["analysis"]: slow_ms}
+    try:
+        ai_advice.FALLBACK_MODEL = None
+        slow = timed(lambda: ai_advice.analyze_cv(SAMPLE_CV), repeat, setup=clear_analysis)
+        ai_advice.FALLBACK_MODEL = fallback or "gemini-1.5-flash"
+        ai_advice.TASK_DEADLINES["analysis"] = deadline
+        hedged = timed(lambda: ai_advice.analyze_cv(SAMPLE_CV), repeat, setup=clear_analysis)
+    finally:
+        gemini.model_latency_ms = {}
+        ai_advice.FALLBACK_MODEL = fallback
+        ai_advice.TASK_DEADLINES.update(deadlines)
+    return {
+        f"analyze_cv, model {slow_ms:.0f} ms slow": slow,
+        f"  hedged after {deadline * 1000:.0f} ms": hedged,
+    }
+
+
+def bench_context(server, repeat: int, ms_per_kchar: float = 40, min_tokens: int = 1024) -> dict:
+    """
+    Repeat job matches for one long CV with the CV sent inline ("prefix") vs.
+    registered as cached content ("remote"): upload size and time to the
+    first pick, after two warm-up calls (the second one starts registering
+    the CV). The API's minimum cache size is scaled down to `min_tokens` on
+    both sides, so the ~1,650-token test CV qualifies.
+    """
+    from utils import ai_advice, cv_context, job_search
+    from utils.cv_context import CONTEXTS
+    from utils.jobs import JobTable
+
+    cv = SAMPLE_CV + "\n".join(
+        f"Project {i}: built a {kind} for client {i} with Python, SQL and Power BI, cutting report time by {i + 10}%"
+        for i, kind in enumerate(["dashboard", "data pipeline", "forecast model", "ETL job"] * 15)
+    )
+    jobs = JobTable(job_search.search_all_jobs(["Data Analyst"], num_results=15)).jobs()
+    gemini = server.config["gemini"]
+    gemini.prompt_ms_per_kchar = ms_per_kchar
+    gemini.min_cache_tokens = min_tokens
+    min_cache_tokens = cv_context.CONTEXT_CACHE_MIN_TOKENS
+    cv_context.CONTEXT_CACHE_MIN_TOKENS = min_tokens
+    results = {}
+    try:
+        for mode in ("prefix", "remote"):
+            CONTEXTS.mode = mode
+            CONTEXTS.clear()
+            first_pick, uploads = [], []
+            for n in range(repeat + 2):
+                ai_advice.MATCH_CACHE.clear()
+                sent = server.stats.bytes_in["gemini"]
+                started = time.perf_counter()
+                first = None
+                for event in ai_advice.match_jobs_with_ai_stream(cv, "Data Analyst", jobs, top_n=3):
+                    if event["event"] == "pick" and first is None:
+                        first = (time.perf_counter() - started) * 1000
+                if n == 1:
+                    _wait_registered(CONTEXTS, mode)
+                if n >= 2 and first is not None:
+                    first_pick.append(first)
+                    uploads.append(server.stats.bytes_in["gemini"] - sent)
+            results[f"match first pick, context {mode}"] = {
+                "median_ms": statistics.median(first_pick), "p95_ms": max(first_pick), "min_ms": min(first_pick),
+            }
+            results[f"match upload, context {mode} (KiB/call)"] = statistics.median(uploads) / 1024
+    finally:
+        gemini.prompt_ms_per_kchar = 0
+        gemini.min_cache_tokens = 0
+        cv_context.CONTEXT_CACHE_MIN_TOKENS = min_cache_tokens
+        CONTEXTS.mode = "prefix"
+        CONTEXTS.clear()
+    return results
+
+
+def _wait_registered(contexts, mode: str, timeout: float = 5) -> None:
+    # Registration runs in the background; measure once it has landed
+    deadline = time.monotonic() + timeout
+    while mode == "remote" and not contexts.stats()["registered"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def bench_parser(repeat: int) -> dict:
+    from benchmarks import bench_parser
+    pages = bench_parser.load_pages()
+    return {
+        "parser per-item (items/s)": bench_parser.bench(bench_parser.parse_per_item, pages, repeat * 40),
+        "parser batch (items/s)": bench_parser.bench(bench_parser.parse_items_batch, pages, repeat * 40),
+    }
+
+
+def bench_memory(jobs: int = 30, sessions: int = 50) -> dict:
+    from benchmarks import bench_memory
+    from utils.jobs import JobTable
+    records = bench_memory.load_records()
+    return {
+        "memory dicts (KiB/session)": bench_memory.measure(list, records, sessions, jobs) / sessions / 1024,
+        "memory JobTable (KiB/session)": bench_memory.measure(JobTable, records, sessions, jobs) / sessions / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=150, help="stand-in server latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-ms", type=float, default=20, help="delay between streamed Gemini chunks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    config = FakeConfig(args.latency_ms, args.jitter_ms, args.error_rate, chunk_ms=args.chunk_ms)
+    server = start_server(cse=config, gemini=config, seed=args.seed)
+    configure_env(server.base_url)
+    # Keep the app's own progress prints out of the report
+    devnull = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, devnull
+    try:
+        latency = {**bench_search(args.repeat), **bench_ai(args.repeat), **bench_hedge(server, min(args.repeat, 3))}
+        context = bench_context(server, args.repeat)
+        latency.update({name: r for name, r in context.items() if isinstance(r, dict)})
+        throughput = bench_parser(args.repeat)
+        memory = {**bench_memory(), **{name: r for name, r in context.items() if not isinstance(r, dict)}}
+    finally:
+        sys.stdout = stdout
+        devnull.close()
+        server.shutdown()
+
+    print(f"Stand-in servers: latency {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, "
+          f"error rate {args.error_rate:.0%}, {args.repeat} runs")
+    print(f"{'':38}{'median':>10}{'p95':>10}{'min':>10}")
+    for name, r in latency.items():
+        print(f"{name:38}{r['median_ms']:10.1f}{r['p95_ms']:10.1f}{r['min_ms']:10.1f}")
+    for name, value in {**throughput, **memory}.items():
+        print(f"{name:38}{value:10,.1f}")
+    print(f"Requests served: {server.stats.requests}, injected errors: {server.stats.errors}")
+    print(f"Gemini requests per model: {server.stats.models}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "config": vars(args),
+                "latency": latency,
+                "throughput": throughput,
+                "memory": memory,
+                "requests": server.stats.requests,
+                "errors": server.stats.errors,
+                "models": server.stats.models,
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+# fake_server.py
+"""
+Local stand-in for Google Custom Search and the Gemini API, replaying the
+recorded responses in fixtures/ with configurable latency and error rates.
+Gemini context caching (cachedContents create/renew/delete) is emulated too.
+Point the app (or a benchmark) at it with
+
+    CSE_BASE_URL=http://127.0.0.1:8765 GEMINI_BASE_URL=http://127.0.0.1:8765
+
+    python -m benchmarks.fake_server [--port 8765] [--latency-ms 300] [--error-rate 0.05]
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Recorded result pages per query; later pages come back empty, like a short result list
+CSE_MAX_PAGES = 3
+_GEMINI_PATH_RE = re.compile(r"^/v1beta/models/([^/:]+):(generateContent|streamGenerateContent)$")
+_CACHE_PATH_RE = re.compile(r"^/v1beta/(cachedContents(?:/[^/]+)?)$")
+
+
+@dataclass
+class FakeConfig:
+    """Behaviour of one stand-in service."""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    # Delay between streamed chunks (Gemini SSE only)
+    chunk_ms: float = 0.0
+    chunk_chars: int = 40
+    # Extra latency per Gemini model, e.g. {"gemini-1.5-pro": 2000}
+    model_latency_ms: dict = field(default_factory=dict)
+    # Prompt processing before the first token, per 1000 characters sent
+    # inline (cached content is free)
+    prompt_ms_per_kchar: float = 0.0
+    # cachedContents smaller than this (est. tokens) are refused, like the real API's minimum
+    min_cache_tokens: int = 0
+
+
+@dataclass
+class FakeStats:
+    requests: dict = field(default_factory=lambda: {"cse": 0, "gemini": 0})
+    errors: dict = field(default_factory=lambda: {"cse": 0, "gemini": 0})
+    models: dict = field(default_factory=dict)
+    bytes_in: dict = field(default_factory=lambda: {"cse": 0, "gemini": 0})
+    cached_contents: dict = field(default_factory=lambda: {"created": 0, "renewed": 0, "deleted": 0, "used": 0})
+
+
+def load_fixtures() -> dict:
+    with open(os.path.join(FIXTURES, "cse_responses.json"), encoding="utf-8") as f:
+        pages = json.load(f)
+    with open(os.path.join(FIXTURES, "gemini_responses.json"), encoding="utf-8") as f:
+        gemini = json.load(f)
+    return {
+        "cse": {
+            "linkedin": [p for p in pages if "linkedin.com" in p["items"][0]["link"]],
+            "bayt": [p for p in pages if "bayt.com" in p["items"][0]["link"]],
+        },
+        "gemini": gemini,
+    }
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeGoogle/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # ── plumbing ─────────────────────────────────────────────
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay_or_fail(self, service: str, model: str = None) -> bool:
+        """Sleep for the configured latency; returns True if an error was sent instead."""
+        config = self.server.config[service]
+        with self.server.lock:
+            self.server.stats.requests[service] += 1
+            if model:
+                self.server.stats.models[model] = self.server.stats.models.get(model, 0) + 1
+            fail = self.server.rng.random() < config.error_rate
+            jitter = self.server.rng.uniform(0, config.jitter_ms)
+            if fail:
+                self.server.stats.errors[service] += 1
+        time.sleep((config.latency_ms + config.model_latency_ms.get(model, 0) + jitter) / 1000)
+        if fail:
+            self._send_json(config.error_status, {
+                "error": {"code": config.error_status, "message": "Injected failure", "status": "UNAVAILABLE"}
+            })
+        return fail
+
+    # ── routes ───────────────────────────────────────────────
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != "/customsearch/v1":
+            return self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+        if self._delay_or_fail("cse"):
+            return
+        self._send_json(200, self._cse_page(parse_qs(url.query)))
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        with self.server.lock:
+            self.server.stats.bytes_in["gemini"] += length
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        body = self._read_json()
+        if url.path == "/v1beta/cachedContents":
+            return self._create_cache(body)
+        match = _GEMINI_PATH_RE.match(url.path)
+        if not match:
+            return self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+        if self._delay_or_fail("gemini", match[1]):
+            return
+        inline = _contents_text(body.get("contents", []))
+        if body.get("cachedContent"):
+            with self.server.lock:
+                cached = self.server.cached.get(body["cachedContent"])
+                usable = cached is not None and cached["expires"] > time.time() and cached["model"] == f"models/{match[1]}"
+                if usable:
+                    self.server.stats.cached_contents["used"] += 1
+            if not usable:
+                return self._send_json(404, {"error": {"code": 404, "message": "CachedContent not found", "status": "NOT_FOUND"}})
+        time.sleep(len(inline) * self.server.config["gemini"].prompt_ms_per_kchar / 1e6)
+        text = self._gemini_text(body)
+        if match[2] == "streamGenerateContent":
+            return self._stream(text)
+        self._send_json(200, _candidate(text))
+
+    def do_PATCH(self):
+        body = self._read_json()
+        match = _CACHE_PATH_RE.match(urlsplit(self.path).path)
+        with self.server.lock:
+            cached = self.server.cached.get(match[1]) if match else None
+            if cached is not None:
+                cached["expires"] = time.time() + _seconds(body.get("ttl"))
+                self.server.stats.cached_contents["renewed"] += 1
+        if cached is None:
+            return self._send_json(404, {"error": {"code": 404, "message": "CachedContent not found", "status": "NOT_FOUND"}})
+        self._send_json(200, _cache_resource(match[1], cached))
+
+    def do_DELETE(self):
+        match = _CACHE_PATH_RE.match(urlsplit(self.path).path)
+        with self.server.lock:
+            cached = self.server.cached.pop(match[1], None) if match else None
+            if cached is not None:
+                self.server.stats.cached_contents["deleted"] += 1
+        if cached is None:
+            return self._send_json(404, {"error": {"code": 404, "message": "CachedContent not found", "status": "NOT_FOUND"}})
+        self._send_json(200, {})
+
+    # ── responses ────────────────────────────────────────────
+    def _create_cache(self, body: dict):
+        if self._delay_or_fail("gemini"):
+            return
+        text = _contents_text(body.get("contents", []))
+        if len(text) // 4 < self.server.config["gemini"].min_cache_tokens:
+            return self._send_json(400, {"error": {
+                "code": 400, "status": "INVALID_ARGUMENT",
+                "message": f"Cached content is too small: minimum is {self.server.config['gemini'].min_cache_tokens} tokens",
+            }})
+        with self.server.lock:
+            self.server.stats.cached_contents["created"] += 1
+            name = f"cachedContents/fake-{self.server.stats.cached_contents['created']}"
+            cached = self.server.cached[name] = {
+                "model": body.get("model", ""), "text": text, "expires": time.time() + _seconds(body.get("ttl")),
+            }
+        self._send_json(200, _cache_resource(name, cached))
+
+    def _cse_page(self, query: dict) -> dict:
+        q = query.get("q", [""])[0]
+        start = int(query.get("start", ["1"])[0])
+        page = (start - 1) // 10
+        if page >= CSE_MAX_PAGES:
+            return {"kind": "customsearch#search", "queries": {}}
+        pages = self.server.fixtures["cse"]["bayt" if "bayt.com" in q else "linkedin"]
+        seed = zlib.crc32(" ".join(q.lower().split()).encode("utf-8"))
+        recorded = pages[(seed + page) % len(pages)]
+        items = []
+        for n, item in enumerate(recorded["items"]):
+            # Distinct links per query and page, so results do not collapse into one set
+            link = f"{item['link']}?q={seed:x}&p={page}&n={n}"
+            items.append({**item, "link": link})
+        return {**recorded, "items": items}
+
+    def _gemini_text(self, body: dict) -> str:
+        schema = body.get("generationConfig", {}).get("responseSchema")
+        return self.server.fixtures["gemini"]["match" if schema else "analysis"]
+
+    def _stream(self, text: str):
+        config = self.server.config["gemini"]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        size = max(1, config.chunk_chars)
+        try:
+            for i in range(0, len(text), size):
+                if i and config.chunk_ms:
+                    time.sleep(config.chunk_ms / 1000)
+                event = f"data: {json.dumps(_candidate(text[i:i + size]))}\r\n\r\n".encode("utf-8")
+                self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, e.g. a hedged stream that lost
+            self.close_connection = True
+
+
+def _contents_text(contents: list) -> str:
+    return "".join(part.get("text", "") for content in contents for part in content.get("parts", []))
+
+
+def _seconds(ttl) -> float:
+    """ "1800s" -> 1800.0; the API's default TTL is one hour."""
+    return float(str(ttl).rstrip("s")) if ttl else 3600.0
+
+
+def _cache_resource(name: str, cached: dict) -> dict:
+    return {
+        "name": name,
+        "model": cached["model"],
+        "expireTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(cached["expires"])),
+        "usageMetadata": {"totalTokenCount": len(cached["text"]) // 4},
+    }
+
+
+def _candidate(text: str) -> dict:
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}]}
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cse: FakeConfig = None, gemini: FakeConfig = None, seed: int = None, verbose: bool = False):
+        super().__init__(address, FakeHandler)
+        self.config = {"cse": cse or FakeConfig(), "gemini": gemini or FakeConfig()}
+        self.fixtures = load_fixtures()
+        self.stats = FakeStats()
+        self.cached = {}  # cachedContents name -> {"model", "text", "expires"}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.verbose = verbose
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(cse: FakeConfig = None, gemini: FakeConfig = None, port: int = 0, seed: int = None) -> FakeServer:
+    """Start a FakeServer on a background thread (port 0 picks a free one)."""
+    server = FakeServer(("127.0.0.1", port), cse, gemini, seed)
+    threading.Thread(target=server.serve_forever, name="fake-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0, help="added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="extra uniform random latency")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--chunk-ms", type=float, default=0, help="delay between streamed Gemini chunks")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=MS",
+                        help="extra latency for one Gemini model (repeatable)")
+    parser.add_argument("--prompt-ms-per-kchar", type=float, default=0,
+                        help="Gemini prompt processing per 1000 inline characters")
+    parser.add_argument("--min-cache-tokens", type=int, default=0, help="smallest cachedContents accepted")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    config = FakeConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.chunk_ms)
+    gemini = FakeConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.chunk_ms,
+                        model_latency_ms={m: float(ms) for m, ms in (item.split("=", 1) for item in args.model_latency)},
+                        prompt_ms_per_kchar=args.prompt_ms_per_kchar, min_cache_tokens=args.min_cache_tokens)
+    server = FakeServer(("127.0.0.1", args.port), config, gemini, args.seed, args.verbose)
+    print(f"Serving fake CSE and Gemini on {server.base_url}")
+    print(f"  CSE_BASE_URL={server.base_url} GEMINI_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,14 @@
 import os
 import sys
-import re
-from dotenv import load_dotenv
+import html
 import streamlit as st
-from streamlit_lottie import st_lottie
-from utils.ai_advice import analyze_cv, match_jobs_with_ai
-from utils.job_search import search_linkedin_jobs, search_bayt_jobs
-from PIL import Image
-from pathlib import Path
-
-# ─── Load ENV ─────────────────────────────────────────────────
-load_dotenv()
+from utils.ai_advice import analyze_cv_stream, match_jobs_with_ai_stream
+from utils.prefetch import PREFETCH_SEARCHES, prefetch_searches, prefetch_stats, search_prefetched
+from utils.jobs import JobTable
+from utils.cards import CARDS_PER_PAGE, is_renderable, render_job_cards, render_top_cards
+from utils.cv_ingest import extract_cv_text, CVTooLargeError
+from utils.lottie import load_lottie
+from utils.telemetry import start_metrics_server
 
 # ─── Streamlit Config ──────────────────────────────────────────
 st.set_page_config(
@@ -20,6 +18,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Prometheus metrics on METRICS_PORT, if set (started once per process)
+start_metrics_server()
+
 # ─── Custom CSS ───────────────────────────────────────────────
 st.markdown("""
     <style>
@@ -207,22 +208,25 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# ─── Lottie Animation Loader ─────────────────────────────────
-def load_lottie_url(url: str):
-    import requests
-    try:
-        r = requests.get(url)
-        if r.status_code == 200:
-            return r.json()
-    except Exception:
-        return None
-    return None
+# ─── Lottie Animations ───────────────────────────────────────
+def show_lottie(animation: dict, height: int, key: str):
+    # streamlit_lottie is only imported once there is an animation to show
+    from streamlit_lottie import st_lottie
+    st_lottie(animation, speed=1, reverse=False, loop=True, quality="high", height=height, key=key)
+
+# ─── Job Card Pagination ─────────────────────────────────────
+def show_more_cards():
+    st.session_state.cards_shown += CARDS_PER_PAGE
+
+def reset_cards():
+    st.session_state.cards_shown = CARDS_PER_PAGE
 
 # ─── SESSION STATE INIT ───────────────────────────────────────
 for key, default in [
     ("cv_text", None),
     ("advice", {}),
-    ("jobs", []),
+    ("jobs", JobTable()),
+    ("cards_shown", CARDS_PER_PAGE),
     ("show_animation", False)
 ]:
     if key not in st.session_state:
@@ -230,8 +234,7 @@ for key, default in [
 
 # ─── Header Section with Logo and Lottie Animation ───────────
 logo_path = "assets/logo.png"
-hero_lottie_url = "https://assets2.lottiefiles.com/packages/lf20_1pxqjqps.json"  # Job search animation
-hero_lottie = load_lottie_url(hero_lottie_url)
+hero_lottie = load_lottie("hero")
 
 # Use Streamlit's st.image for the logo (works with local files)
 st.image(logo_path, width=110)
@@ -242,7 +245,7 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 if hero_lottie:
-    st_lottie(hero_lottie, speed=1, reverse=False, loop=True, quality="high", height=220, key="hero_lottie")
+    show_lottie(hero_lottie, 220, "hero_lottie")
 
 # ─── CV Upload Section ────────────────────────────────────────
 st.markdown("<div class='section-header'>📄 Upload Your CV</div>", unsafe_allow_html=True)
@@ -250,19 +253,19 @@ with st.container():
     st.markdown("<div class='upload-section'>", unsafe_allow_html=True)
     if not st.session_state.cv_text:
         # Show Lottie animation and instruction if no CV uploaded
-        upload_lottie_url = "https://assets2.lottiefiles.com/packages/lf20_j1adxtyb.json"  # upload animation
-        upload_lottie = load_lottie_url(upload_lottie_url)
+        upload_lottie = load_lottie("upload")
         if upload_lottie:
-            st_lottie(upload_lottie, speed=1, reverse=False, loop=True, quality="high", height=120, key="upload_lottie")
+            show_lottie(upload_lottie, 120, "upload_lottie")
         st.markdown("<div style='text-align:center; color:#cccccc; font-size:1.1em; margin-bottom:1em;'>Please upload your PDF CV to get started.</div>", unsafe_allow_html=True)
     uploaded = st.file_uploader("Drag and drop your PDF CV here", type="pdf", label_visibility="visible")
     if uploaded:
         try:
-            import fitz  # PyMuPDF
-            doc = fitz.open(stream=uploaded.read(), filetype="pdf")
-            text = "\n".join(page.get_text() for page in doc)
-            st.session_state.cv_text = text
+            parsed = extract_cv_text(uploaded.getvalue())
+            st.session_state.cv_text = parsed["text"]
             st.success("CV uploaded and parsed successfully!")
+            st.caption(f"{parsed['pages']} pages in {parsed['timings']['total_ms']:.0f} ms" + (" (cached)" if parsed["cached"] else ""))
+        except CVTooLargeError as ex:
+            st.error(str(ex))
         except Exception as ex:
             st.error(f"Failed to parse PDF: {ex}")
     if st.session_state.cv_text:
@@ -278,13 +281,27 @@ if st.session_state.cv_text:
         advice_container = st.empty()
         if st.button("Get AI Career Advice", key="get_advice"):
             with st.spinner("AI is analyzing your CV..."):
-                advice = analyze_cv(st.session_state.cv_text)
+                # Render advice bullets as they stream in
+                streamed = []
+                advice = {}
+                for event in analyze_cv_stream(st.session_state.cv_text):
+                    if event["event"] == "advice":
+                        streamed.append(event["text"])
+                        advice_container.markdown("<ul class='advice-text'>" + "".join(f"<li>{a}</li>" for a in streamed) + "</ul>", unsafe_allow_html=True)
+                    elif event["event"] == "done":
+                        advice = event["result"]
+                advice_container.empty()
                 if advice.get("error"):
                     st.error(advice["error"])
                 else:
                     st.session_state.advice = advice
+                    # Search every suggested title in the background while the user reads
+                    prefetch_searches(advice.get("job_titles", []), st.session_state.get("num_results", 5))
         if st.session_state.advice.get("advice_bullets"):
             st.markdown("<ul class='advice-text'>" + "".join(f"<li>{a}</li>" for a in st.session_state.advice["advice_bullets"]) + "</ul>", unsafe_allow_html=True)
+            tokens = st.session_state.advice.get("prompt_tokens")
+            if tokens:
+                st.caption(f"Prompt size (est. tokens): {tokens['before']:,} → {tokens['after']:,}")
         st.markdown("</div>", unsafe_allow_html=True)
 
 # ─── Job Search Section ──────────────────────────────────────
@@ -295,139 +312,83 @@ if st.session_state.advice.get("job_titles"):
         query_titles = st.session_state.advice["job_titles"]
         selected_title = st.selectbox("Job Title", query_titles, index=0)
         # Remove custom CSS for the slider to avoid blue background
-        num_results = st.slider("Number of jobs per source", 3, 15, 5)
+        num_results = st.slider("Number of jobs per source", 3, 15, 5, key="num_results")
         if st.button("Search Jobs", key="search_jobs"):
             with st.spinner("Searching LinkedIn and Bayt jobs..."):
-                jobs = search_linkedin_jobs([selected_title], num_results) + search_bayt_jobs([selected_title], num_results)
-                # Deduplicate jobs by title+link
-                seen = set()
-                deduped = []
-                for job in jobs:
-                    key = (job.get('title','').lower(), job.get('link',''))
-                    if key not in seen and job.get('title') and job.get('link'):
-                        seen.add(key)
-                        deduped.append(job)
-                st.session_state.jobs = deduped
+                # JobTable drops duplicates by title+link and jobs without either
+                jobs, prefetched = search_prefetched(selected_title, num_results)
+                st.session_state.jobs = JobTable(jobs)
+                # New results: reset the filters to "everything selected"
+                for key in ("filter_location", "filter_type", "filter_source"):
+                    st.session_state.pop(key, None)
+                reset_cards()
+            if PREFETCH_SEARCHES:
+                stats = prefetch_stats()
+                st.caption(("Prefetched" if prefetched else "Not prefetched") + f" · hit rate {stats['hit_rate']:.0%} ({stats['hit']}/{stats['lookups']})")
     # Display results & filters
     if st.session_state.jobs:
         jobs = st.session_state.jobs
         with st.sidebar:
             st.markdown("<div class='subsection-header'>Filters</div>", unsafe_allow_html=True)
-            locs = sorted({j.get("location", "Unknown") for j in jobs})
-            types = sorted({j.get("type", "Unknown") for j in jobs})
-            sources = sorted({j.get("source", "Unknown") for j in jobs})
-            sel_locs = st.multiselect("Location", locs, default=locs, help="Filter jobs by location")
-            sel_types = st.multiselect("Job Type", types, default=types, help="Filter jobs by type (e.g., Full-time, Part-time)")
-            sel_sources = st.multiselect("Source", sources, default=sources, help="Filter jobs by source platform")
-        filtered = [
-            j for j in jobs
-            if j.get("location") in sel_locs 
-            and j.get("type") in sel_types
-            and j.get("source") in sel_sources
-        ]
+            facets = jobs.facets()
+            locs = facets.values("location")
+            types = facets.values("type")
+            sources = facets.values("source")
+            # Counts next to each option: jobs left if it is selected, given the other filters
+            current = {
+                "location": st.session_state.get("filter_location", locs),
+                "type": st.session_state.get("filter_type", types),
+                "source": st.session_state.get("filter_source", sources),
+            }
+            loc_counts = facets.option_counts("location", **current)
+            type_counts = facets.option_counts("type", **current)
+            source_option_counts = facets.option_counts("source", **current)
+            sel_locs = st.multiselect("Location", locs, default=locs, key="filter_location", on_change=reset_cards, format_func=lambda v: f"{v} ({loc_counts[v]})", help="Filter jobs by location")
+            sel_types = st.multiselect("Job Type", types, default=types, key="filter_type", on_change=reset_cards, format_func=lambda v: f"{v} ({type_counts[v]})", help="Filter jobs by type (e.g., Full-time, Part-time)")
+            sel_sources = st.multiselect("Source", sources, default=sources, key="filter_source", on_change=reset_cards, format_func=lambda v: f"{v} ({source_option_counts[v]})", help="Filter jobs by source platform")
+        selection = facets.select(location=sel_locs, type=sel_types, source=sel_sources)
+        filtered = jobs.jobs(facets.ids(selection))
         st.markdown(f"<div style='font-size:1.2em; margin:1.5em 0 0.5em 0; color:#00aaff;'><b>Found {len(filtered)} matching jobs</b></div>", unsafe_allow_html=True)
         # Show source distribution
-        source_counts = {}
-        for job in filtered:
-            source = job.get("source", "Unknown")
-            source_counts[source] = source_counts.get(source, 0) + 1
+        source_counts = {source: count for source, count in facets.counts("source", selection).items() if count}
         st.markdown("<div style='font-size:1.1em; margin-bottom:0.5em; color:#eeeeee;'><b>Jobs by source:</b></div>", unsafe_allow_html=True)
         st.markdown("<ul style='margin-top:0; margin-bottom:1.5em;'>" + "".join(f"<li style='color:#cccccc;'>{source}: <b>{count}</b> jobs</li>" for source, count in source_counts.items()) + "</ul>", unsafe_allow_html=True)
         # AI-powered job matching
         if filtered:
+            picks_container = st.empty()
             with st.spinner("AI is analyzing jobs..."):
-                ai_result = match_jobs_with_ai(st.session_state.cv_text, selected_title, filtered, top_n=3)
+                # Show each AI pick as soon as it is named
+                picks = []
+                ai_result = {}
+                for event in match_jobs_with_ai_stream(st.session_state.cv_text, selected_title, filtered, top_n=3):
+                    if event["event"] == "pick":
+                        # Titles come straight from search results: escape like the cards do
+                        picks.append(html.escape(event["match"].job.get("title") or "-"))
+                        picks_container.markdown("<div style='color:#00ffff;'>🤖 Top picks so far: " + ", ".join(picks) + "</div>", unsafe_allow_html=True)
+                    elif event["event"] == "done":
+                        ai_result = event["result"]
+            picks_container.empty()
             if ai_result.get("error"):
                 st.error("AI job matching failed. Please try again later or check your API key.")
-            elif not ai_result.get("ai_job_matches"):
+            elif not ai_result.get("matches"):
                 st.warning("No AI job recommendations were returned. Try a different job title or check your connection.")
             else:
-                ai_text = ai_result["ai_job_matches"]
-                ai_titles = re.findall(r'Title: (.+)', ai_text)
-                ai_titles = [t.strip() for t in ai_titles]
-                ai_recommended_jobs = []
-                for t in ai_titles:
-                    for job in filtered:
-                        if job.get('title') == t and job not in ai_recommended_jobs:
-                            ai_recommended_jobs.append(job)
-                            break
+                if ai_result.get("ranking") == "local":
+                    st.info("AI matching is unavailable right now, so these picks come from a local similarity ranking.")
+                ai_matches = ai_result["matches"]
+                ai_recommended_jobs = [m.job for m in ai_matches]
+                ai_links = {job.get('link') for job in ai_recommended_jobs}
                 if ai_recommended_jobs:
                     st.markdown("<div class='subsection-header'>🤖 AI-Recommended Jobs</div>", unsafe_allow_html=True)
-                    cols = st.columns(3)
-                    for idx, job in enumerate(ai_recommended_jobs[:3]):
-                        if not job.get('title') or not job.get('desc') or job['title'].strip().lower() == 'jobs':
-                            continue
-                        with cols[idx]:
-                            desc = job.get('desc', '')
-                            desc = re.sub(r'\s+', ' ', desc)
-                            desc = re.sub(r'\.{2,}', '...', desc)
-                            desc = desc[:180] + '...' if len(desc) > 180 else desc
-                            source_icons = {"linkedin": "🔗", "bayt": "💼"}
-                            source_icon = source_icons.get(job.get("source", "").lower(), "")
-                            st.markdown(f"""
-                            <div class='job-card' style='border:3px solid #00ffff; background: linear-gradient(135deg, #0a3d62 60%, #00aaff 100%); box-shadow: 0 4px 16px rgba(0,255,255,0.18); position:relative;'>
-                                <div style='position:absolute; top:10px; right:10px; background-color:#00ffff; color:#0a3d62; padding:4px 8px; border-radius:4px; font-weight:bold; font-size:0.8em;'>
-                                    ⭐ Top AI Match
-                                </div>
-                                <h4 style='margin:0 0 0.5rem 0; font-size:1.3rem; padding-right:100px;'>
-                                    <a href=\"{job['link']}\" target=\"_blank\" style='color:#00ffff; text-decoration:none;'>
-                                        {job['title']}
-                                    </a>
-                                </h4>
-                                <div style='margin:0.25rem 0; font-size:0.9em;'>
-                                    <span style='color:#00ffff;'>📍</span> <strong>Location:</strong> {job.get('location', '-')}
-                                </div>
-                                <div style='margin:0.25rem 0; font-size:0.9em;'>
-                                    <span style='color:#00ffff;'>💼</span> <strong>Type:</strong> {job.get('type', '-')}
-                                </div>
-                                <div style='margin:0.25rem 0; font-size:0.9em;'>
-                                    <span style='color:#00ffff;'>{source_icon}</span> <strong>Source:</strong> {job.get('source', '-')}
-                                </div>
-                                <div style='margin:0.5rem 0; font-size:0.9em; color:#cccccc; line-height:1.4;'>
-                                    {desc}
-                                </div>
-                            </div>
-                            """, unsafe_allow_html=True)
+                    st.markdown(render_top_cards(ai_matches[:3]), unsafe_allow_html=True)
                     st.markdown("<hr style='margin: 2rem 0; border: 1px solid #555;'>", unsafe_allow_html=True)
-                other_jobs = [job for job in filtered if job.get('title') not in ai_titles]
+                other_jobs = [job for job in filtered if job.get('link') not in ai_links and is_renderable(job)]
                 if other_jobs:
                     st.markdown("<div class='subsection-header'>All Matching Jobs</div>", unsafe_allow_html=True)
-                    cols_per_row = 2
-                    if other_jobs:
-                        cols_other = st.columns(cols_per_row)
-                        for idx, job in enumerate(other_jobs):
-                            if not job.get('title') or not job.get('desc') or job['title'].strip().lower() == 'jobs':
-                                continue
-                            col_idx = idx % cols_per_row
-                            with cols_other[col_idx]:
-                                desc = job.get('desc', '')
-                                desc = re.sub(r'\s+', ' ', desc)
-                                desc = re.sub(r'\.{2,}', '...', desc)
-                                desc = desc[:150] + '...' if len(desc) > 150 else desc
-                                source_icons = {"linkedin": "🔗", "bayt": "💼"}
-                                source_icon = source_icons.get(job.get("source", "").lower(), "")
-                                source_colors = {"linkedin": "#0e4a6f", "bayt": "#4a4a00"}
-                                bg_color = source_colors.get(job.get("source", "").lower(), "#3a404b")
-                                border_color = "#555"
-                                st.markdown(f"""
-                                <div class='job-card' style='border:2px solid {border_color}; background-color:{bg_color};'>
-                                    <h4 style='margin:0 0 0.5rem 0; font-size:1.2rem;'>
-                                        <a href=\"{job['link']}\" target=\"_blank\" style='color:#00aaff; text-decoration:none;'>
-                                            {job['title']}
-                                        </a>
-                                    </h4>
-                                    <div style='margin:0.25rem 0; font-size:0.9em;'>
-                                        <span style='color:#aaaaaa;'>📍</span> <strong>Location:</strong> {job.get('location', '-')}
-                                    </div>
-                                    <div style='margin:0.25rem 0; font-size:0.9em;'>
-                                        <span style='color:#aaaaaa;'>💼</span> <strong>Type:</strong> {job.get('type', '-')}
-                                    </div>
-                                    <div style='margin:0.25rem 0; font-size:0.9em;'>
-                                        <span style='color:#aaaaaa;'>{source_icon}</span> <strong>Source:</strong> {job.get('source', '-')}
-                                    </div>
-                                    <div style='margin:0.5rem 0; font-size:0.9em; color:#cccccc; line-height:1.4;'>
-                                        {desc}
-                                    </div>
-                                </div>
-                                """, unsafe_allow_html=True)
+                    # One HTML block for the shown cards; "Load more" grows it by a page
+                    shown = st.session_state.cards_shown
+                    st.markdown(render_job_cards(other_jobs[:shown]), unsafe_allow_html=True)
+                    if shown < len(other_jobs):
+                        st.caption(f"Showing {shown} of {len(other_jobs)} jobs")
+                        st.button("Load more", on_click=show_more_cards)
         st.markdown("</div>", unsafe_allow_html=True)
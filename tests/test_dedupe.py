@@ -0,0 +1,69 @@
+import json
+import os
+import unittest
+
+from utils.dedupe import canonical_url, cluster_duplicates, dedupe_jobs, posting_key
+from utils.job_search import _parse_items
+from utils.jobs import Job
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "fixtures", "cse_responses.json")
+
+
+def domain_of(link: str) -> str:
+    return "linkedin.com/jobs" if "linkedin" in link else "bayt.com"
+
+
+def fixture_jobs() -> list[Job]:
+    # What search_all_jobs keeps of each page, after its Lebanon filter
+    with open(FIXTURE, encoding="utf-8") as f:
+        pages = json.load(f)
+    return [job for page in pages for job in _parse_items(domain_of(page["items"][0]["link"]), page["items"])]
+
+
+def item(title, link, snippet) -> list[Job]:
+    return _parse_items(domain_of(link), [{"title": title, "link": link, "snippet": snippet}])
+
+
+class DedupeTest(unittest.TestCase):
+    def test_fixture_has_no_false_clusters(self):
+        jobs = fixture_jobs()
+        self.assertEqual([c for c in cluster_duplicates(jobs) if len(c) > 1], [])
+
+    def test_same_vacancy_on_two_boards_is_one_job(self):
+        linkedin = item(
+            "touch hiring Data Analyst in Beirut, Lebanon | LinkedIn",
+            "https://lb.linkedin.com/jobs/view/data-analyst-at-touch-5120448873",
+            "2 days ago · touch is looking for a Data Analyst to join our team in Beirut. Full-time position ... Apply now.",
+        )
+        bayt = item(
+            "Data Analyst at touch s.a.l. - Beirut | Bayt.com",
+            "https://www.bayt.com/en/lebanon/jobs/data-analyst-4410021/",
+            "Posted 2 days ago. touch - Full-time role. Requirements: 3+ years of experience in data analysis...",
+        )
+        # The LinkedIn location ("Beirut, Lebanon", without "| LinkedIn") passes the filter
+        self.assertEqual((len(linkedin), len(bayt)), (1, 1))
+        self.assertEqual(posting_key(linkedin[0]), posting_key(bayt[0]))
+        jobs = fixture_jobs()
+        unique = dedupe_jobs(linkedin + bayt + jobs)
+        self.assertEqual(len(unique), len(jobs) + 1)
+
+    def test_same_title_in_another_city_is_kept(self):
+        beirut = item("Alfa hiring Project Manager in Beirut, Lebanon | LinkedIn",
+                      "https://lb.linkedin.com/jobs/view/project-manager-at-alfa-4047437007", "")
+        dubai = item("Project Manager at Alfa - Dubai | Bayt.com",
+                     "https://www.bayt.com/en/lebanon/jobs/project-manager-2211906/", "")
+        self.assertEqual(len(dedupe_jobs(beirut + dubai)), 2)
+
+    def test_url_variants_are_one_posting(self):
+        self.assertEqual(
+            canonical_url("https://lb.linkedin.com/jobs/view/data-analyst-at-touch-3301595691?trk=abc"),
+            canonical_url("https://www.linkedin.com/jobs/view/3301595691/"),
+        )
+        self.assertEqual(
+            canonical_url("https://www.bayt.com/en/lebanon/jobs/software-engineer-2302255/"),
+            canonical_url("https://www.bayt.com/ar/lebanon/jobs/software-engineer-2302255/?utm=x"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
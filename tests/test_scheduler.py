@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+
+from utils import scheduler
+from utils.scheduler import (
+    PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL,
+    DailyBudget, QuotaExceededError, Scheduler, TokenBucket,
+)
+
+
+def make_scheduler(rate: float, budget: int = 0) -> Scheduler:
+    sched = Scheduler()
+    sched.buckets = {"cse": TokenBucket(rate, 1)}
+    sched.budgets = {"cse": DailyBudget(budget)}
+    # Drain the bucket, so every request below has to queue for a token
+    sched.buckets["cse"].acquire()
+    return sched
+
+
+def start(fn, *args):
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = fn(*args)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    time.sleep(0.05)  # let it take its place in the queue
+    return thread, outcome
+
+
+class SchedulerPriorityTest(unittest.TestCase):
+    def test_urgent_follower_moves_a_coalesced_call_up_the_queue(self):
+        sched = make_scheduler(rate=5)
+        admitted = []
+
+        def fetch(name):
+            admitted.append(name)
+            return name
+
+        low, _ = start(sched.run, "cse", "page-a", lambda: fetch("a"), PRIORITY_LOW)
+        other, _ = start(sched.run, "cse", "page-b", lambda: fetch("b"), PRIORITY_NORMAL)
+        follower, outcome = start(sched.run, "cse", "page-a", lambda: fetch("a again"), PRIORITY_HIGH)
+        for thread in (low, other, follower):
+            thread.join(5)
+
+        self.assertEqual(admitted, ["a", "b"])
+        self.assertEqual(outcome, {"result": "a"})
+
+    def test_urgent_follower_is_not_refused_by_the_leaders_budget_reserve(self):
+        # 2 of 10 queries left: below the reserve LOW requests keep back, fine for HIGH
+        sched = make_scheduler(rate=5, budget=10)
+        sched.budgets["cse"].used = 8
+
+        leader, leader_outcome = start(sched.run, "cse", "page", lambda: "jobs", PRIORITY_LOW)
+        follower, outcome = start(sched.run, "cse", "page", lambda: "jobs", PRIORITY_HIGH)
+        for thread in (leader, follower):
+            thread.join(5)
+
+        self.assertEqual(leader_outcome, {"result": "jobs"})
+        self.assertEqual(outcome, {"result": "jobs"})
+        self.assertEqual(sched.budgets["cse"].used, 9)
+
+    def test_rate_limit_timeout_spends_no_budget(self):
+        sched = make_scheduler(rate=0.01, budget=10)
+        max_wait = scheduler.SCHEDULER_MAX_WAIT
+        scheduler.SCHEDULER_MAX_WAIT = 0.1
+        try:
+            with self.assertRaises(QuotaExceededError):
+                sched.acquire("cse", PRIORITY_HIGH)
+        finally:
+            scheduler.SCHEDULER_MAX_WAIT = max_wait
+        self.assertEqual(sched.budgets["cse"].used, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
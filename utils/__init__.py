@@ -1,11 +1,23 @@
 # utils package
-# Expose core functions at package level
+# Expose core functions at package level. Settings (and .env) load first;
+# the feature modules are imported on first attribute access, so importing
+# one submodule does not pull in the whole package.
 
-from .ai_advice import analyze_cv
-from .job_search import search_linkedin_jobs, search_bayt_jobs
+from . import settings as _settings  # noqa: F401
 
-__all__ = [
-    "analyze_cv",
-    "search_linkedin_jobs",
-    "search_bayt_jobs",
-]
+_EXPORTS = {
+    "analyze_cv": ".ai_advice",
+    "analyze_cv_stream": ".ai_advice",
+    "search_linkedin_jobs": ".job_search",
+    "search_bayt_jobs": ".job_search",
+    "search_all_jobs": ".job_search",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(_EXPORTS[name], __name__), name)
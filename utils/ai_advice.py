@@ -1,64 +1,515 @@
 import os
-import requests
+import time
 import json
-from dotenv import load_dotenv
-load_dotenv()
+import queue
+import threading
+import contextvars
+import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from . import http_client
+from .jobs import Job
+from .cv_compact import CV_TOKEN_BUDGET, estimate_tokens
+from .cv_context import CONTEXTS, CVContext
+from .cache import CACHE_DIR, LRUCache, SQLiteTTLCache, make_key, text_hash
+from .settings import settings
+from .telemetry import annotate, count, observe, span, traced
+from .scheduler import SCHEDULER, PRIORITY_HIGH, QuotaExceededError
+
+GEMINI_KEY = settings.gemini_api_key
+# v1beta: responseSchema (structured output) is not available on v1 for 1.5 models
+GEMINI_API_ROOT = f"{settings.gemini_base_url}/v1beta/models"
+
+# Model per task: the CV analysis needs the strongest model, picking jobs
+# from a short list does not
+TASK_MODELS = {"analysis": settings.gemini_analysis_model, "match": settings.gemini_match_model}
+# Latency budget per task in seconds (0 = none). A call the task's model has not
+# answered within it (or that fails first) is also sent to FALLBACK_MODEL, and
+# the first valid answer wins; for streams, the first stream to start.
+TASK_DEADLINES = {
+    "analysis": float(os.getenv("GEMINI_ANALYSIS_DEADLINE", 20)),
+    "match": float(os.getenv("GEMINI_MATCH_DEADLINE", 6)),
+}
+FALLBACK_MODEL = settings.gemini_fallback_model
+# Threads for calls that may be hedged; a call waits on them, so never submit from one
+_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("GEMINI_MAX_CONCURRENCY", 16)), thread_name_prefix="gemini")
+
+ADVICE_EMOJIS = ["🎯", "💡", "📚", "🚀", "🎓", "💼", "🌟", "📈", "🎨", "🔍", "🧭", "🗨", "🎮", "🌐", "📱"]
+
+# Pads an answer with fewer than 8 advice points
+DEFAULT_ADVICE = [
+    "🎯 Set clear career goals and milestones",
+    "💡 Focus on building relevant technical skills",
+    "📚 Consider additional certifications or training",
+    "🚀 Look for growth opportunities in your current role",
+    "💼 Network and build professional connections",
+    "🎮 Build a portfolio of personal projects",
+    "🌐 Stay updated with industry trends and technologies",
+    "📱 Develop both technical and soft skills"
+]
+
+# Bump whenever the analyze_cv prompt or parsing changes, so old entries are ignored
+ANALYZE_PROMPT_VERSION = "3"
+
+# Two-tier cache of successful analyze_cv results: in-process LRU in front of SQLite
+ANALYSIS_CACHE = LRUCache(int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 128)))
+ANALYSIS_DISK_CACHE = SQLiteTTLCache(
+    os.getenv("ANALYSIS_CACHE_PATH", os.path.join(CACHE_DIR, "analysis_cache.sqlite3")),
+    ttl=float(os.getenv("ANALYSIS_CACHE_TTL", 30 * 24 * 3600)),
+    max_entries=int(os.getenv("ANALYSIS_CACHE_DISK_MAX_ENTRIES", 2000)),
+)
+
+# Only the PRERANK_TOP_K best jobs by local score are sent to Gemini
+PRERANK_TOP_K = int(os.getenv("PRERANK_TOP_K", 15))
+
+# Job picks are short JSON objects, so the answer needs far fewer tokens than free text
+MATCH_MAX_OUTPUT_TOKENS = int(os.getenv("MATCH_MAX_OUTPUT_TOKENS", 512))
+
+MATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER"},
+            "score": {"type": "NUMBER"},
+            "reason": {"type": "STRING"},
+        },
+        "required": ["index", "score", "reason"],
+    },
+}
 
-GEMINI_KEY = os.getenv("GEMINI_API_KEY")
-BASE_URL = "https://generativelanguage.googleapis.com/v1/models/gemini-1.5-pro:generateContent"
+# Rankings shared by all sessions: (cv hash, title, top_n, match model) + job link set -> result
+MATCH_CACHE = LRUCache(int(os.getenv("MATCH_CACHE_MAX_ENTRIES", 256)))
 
 
+def _analysis_key(cv_text: str) -> str:
+    normalized = " ".join((cv_text or "").split())
+    return make_key(text_hash(normalized), ANALYZE_PROMPT_VERSION, TASK_MODELS["analysis"], CV_TOKEN_BUDGET)
+
+
+def _analysis_attrs(result: dict) -> dict:
+    if result.get("error"):
+        return {"error_type": result.get("error_type")}
+    return {"titles": len(result.get("job_titles", []))}
+
+
+def _match_attrs(result: dict) -> dict:
+    return {"matches": len(result.get("matches", [])), "ranking": result.get("ranking", "ai")}
+
+
+@traced("gemini.analyze", _analysis_attrs)
 def analyze_cv(cv_text: str) -> dict:
+    """
+    Analyze a CV with Gemini. Successful results are cached by a hash of the
+    normalized CV text, the prompt version and the model, first in memory and
+    then on disk, so repeat clicks and re-uploads cost no tokens.
+    """
     if not GEMINI_KEY:
         return {
             "error": "GEMINI_API_KEY is missing. Please check your .env file.",
             "error_type": "config"
         }
 
-    url = f"{BASE_URL}?key={GEMINI_KEY}"
-    prompt = (
-        "You are a career advisor. From this CV, do the following:\n"
+    key = _analysis_key(cv_text)
+    result = _cached_analysis(key)
+    annotate(cache_hit=result is not None)
+    if result is not None:
+        return result
+
+    result, model = _analyze_cv(cv_text)
+    _store_analysis(key, result, model)
+    return result
+
+
+def _cached_analysis(key: str):
+    result = ANALYSIS_CACHE.get(key)
+    if result is None:
+        result = ANALYSIS_DISK_CACHE.get(key)
+        if result is not None:
+            ANALYSIS_CACHE.set(key, result)
+    return dict(result) if result is not None else None
+
+
+def _parsed_analysis(result: dict) -> bool:
+    """Whether the answer had job titles and advice of its own (a refusal parses to neither)."""
+    return bool(result.get("job_titles")) and any(a not in DEFAULT_ADVICE for a in result.get("advice_bullets", []))
+
+
+def _store_analysis(key: str, result: dict, model: str) -> None:
+    # Only the analysis model's own answers: a hedged fallback's answer would
+    # otherwise be served under its key for the whole ANALYSIS_CACHE_TTL
+    if not result.get("error") and model == TASK_MODELS["analysis"] and _parsed_analysis(result):
+        ANALYSIS_CACHE.set(key, result)
+        ANALYSIS_DISK_CACHE.set(key, result)
+
+
+@dataclass(frozen=True)
+class _Prompt:
+    """
+    Instructions about one CV. The CV goes first, as its context's prefix
+    part, so every prompt about a CV starts the same way; in remote context
+    mode it is a reference to the CV's cached content instead.
+    """
+    context: CVContext
+    text: str
+    generation_config: dict = None
+
+    def body(self, model: str, create: bool = True) -> dict:
+        name = CONTEXTS.cached_name(self.context, model, create)
+        if name:
+            body = {"cachedContent": name, "contents": [{"role": "user", "parts": [{"text": self.text}]}]}
+        else:
+            body = {"contents": [{"role": "user", "parts": [{"text": self.context.prefix}, {"text": self.text}]}]}
+        if self.generation_config:
+            body["generationConfig"] = self.generation_config
+        annotate(context_cached=bool(name), upload_chars=len(self.text) + (0 if name else len(self.context.prefix)))
+        return body
+
+
+def _stale_context(body: dict, status_code: int) -> bool:
+    """
+    Whether a failed request referenced cached content the API no longer has:
+    404, or 403 which Gemini answers for a cachedContent that is gone. Other
+    errors (429, 400 validation) leave the registration alone.
+    """
+    return "cachedContent" in body and status_code in (403, 404)
+
+
+def _compact_prompt(cv_text: str, text: str):
+    """
+    Prompt of `text` after the compacted CV. Returns (prompt, prompt_tokens)
+    where prompt_tokens estimates the prompt size with the raw vs. compacted CV.
+    """
+    context = CONTEXTS.get(cv_text)
+    after = estimate_tokens(context.prefix) + estimate_tokens(text)
+    prompt_tokens = {"before": after - context.tokens_after + context.tokens_before, "after": after}
+    annotate(prompt_chars=len(context.prefix) + len(text), prompt_tokens=after, cv_tokens_saved=prompt_tokens["before"] - after)
+    return _Prompt(context, text), prompt_tokens
+
+
+def _analysis_prompt() -> str:
+    return (
+        "You are a career advisor. From the CV above, do the following:\n"
         "1. Suggest 3-5 realistic job titles for the user (as a JSON list).\n"
         "2. Give exactly 8 main career advice points. Each point should start with a relevant emoji "
         "(like 🎯 for goals, 💡 for insights, 📚 for learning, 🚀 for growth, or 💼 for career). "
-        "Format each point as a single line starting with the emoji followed by the advice.\n\n"
-        + cv_text
+        "Format each point as a single line starting with the emoji followed by the advice."
     )
-    
-    try:
-        resp = requests.post(url, json={"contents":[{"parts":[{"text":prompt}]}]}, timeout=30)
-        resp.raise_for_status()
-    except requests.exceptions.ConnectionError as e:
+
+
+def _request_error(e: Exception) -> dict:
+    # Checked first: requests' JSONDecodeError is also a RequestException
+    if isinstance(e, (KeyError, IndexError, json.JSONDecodeError)):
+        return {
+            "error": "Received invalid response from AI service. Please try again.",
+            "error_type": "response",
+            "details": str(e)
+        }
+    if isinstance(e, QuotaExceededError):
+        return {
+            "error": "The AI service is busy right now. Please try again in a moment.",
+            "error_type": "quota",
+            "details": str(e)
+        }
+    if isinstance(e, requests.exceptions.ConnectionError):
         return {
             "error": "Could not connect to the AI service. Please check your internet connection and try again.",
             "error_type": "connection",
             "details": str(e)
         }
-    except requests.exceptions.Timeout:
+    if isinstance(e, requests.exceptions.Timeout):
         return {
             "error": "The AI service took too long to respond. Please try again.",
             "error_type": "timeout"
         }
-    except requests.exceptions.RequestException as e:
+    if isinstance(e, requests.exceptions.RequestException):
         return {
             "error": f"Error communicating with the AI service: {str(e)}",
             "error_type": "request"
         }
+    return {
+        "error": f"An unexpected error occurred: {str(e)}",
+        "error_type": "unknown"
+    }
+
+
+def _model_url(model: str, method: str) -> str:
+    # No ?key=: error messages quote the URL, and they end up in the UI and batch output
+    return f"{GEMINI_API_ROOT}/{model}:{method}"
+
+
+def _auth_headers() -> dict:
+    return {"x-goog-api-key": GEMINI_KEY}
+
+
+def _hedge_model(task: str):
+    """The model a slow or failed call of this task falls back to, if any."""
+    return FALLBACK_MODEL if FALLBACK_MODEL and FALLBACK_MODEL != TASK_MODELS[task] else None
+
+
+def _generate_text(body: dict, model: str, priority: int = PRIORITY_HIGH) -> str:
+    """
+    Text of a generateContent answer. Goes through the shared scheduler, so
+    identical requests in flight from several sessions make one API call.
+    """
+    def call():
+        resp = http_client.post(_model_url(model, "generateContent"), endpoint="gemini", headers=_auth_headers(), json=body)
+        resp.raise_for_status()
+        return resp.json()["candidates"][0]["content"]["parts"][0]["text"]
+
+    return SCHEDULER.run("gemini", make_key(model, body), call, priority)
+
+
+def _attempt(task: str, model: str, prompt: _Prompt, parse, priority: int, hedge: bool = False):
+    """parse() of one model's answer, timed per model."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with span("gemini.request", task=task, model=model):
+            # A hedge is about speed: it uses a registered CV but does not wait to register one
+            body = prompt.body(model, create=not hedge)
+            try:
+                text = _generate_text(body, model, priority)
+            except requests.exceptions.HTTPError as e:
+                if e.response is None or not _stale_context(body, e.response.status_code):
+                    raise
+                CONTEXTS.expired(prompt.context, model)
+                text = _generate_text(prompt.body(model, create=False), model, priority)
+            outcome = "invalid"
+            result = parse(text)
+            outcome = "ok"
+            return result
+    finally:
+        observe("gemini_request_duration_seconds", time.perf_counter() - started, task=task, model=model, outcome=outcome)
+
+
+def _won(task: str, model: str, hedged: bool) -> None:
+    count("gemini_wins_total", task=task, model=model, hedged=str(hedged).lower())
+    annotate(model=model, hedged=hedged)
+
+
+def _generate(task: str, prompt: _Prompt, parse=str, priority: int = PRIORITY_HIGH):
+    """
+    parse(text) of the task model's answer; `parse` raising marks an answer
+    invalid. Hedged within the task's latency budget (see TASK_DEADLINES):
+    whichever model answers validly first wins, the other answer is dropped.
+    Returns (parsed, model); raises the first error if no answer was valid.
+    """
+    primary = TASK_MODELS[task]
+    hedge = _hedge_model(task)
+    if hedge is None:
+        result = _attempt(task, primary, prompt, parse, priority)
+        _won(task, primary, False)
+        return result, primary
+
+    def submit(model):
+        # In a copy of this context, so the request span joins this trace
+        future = _EXECUTOR.submit(contextvars.copy_context().run, _attempt, task, model, prompt, parse, priority, model != primary)
+        attempts[future] = model
+
+    attempts = {}
+    errors = []
+    hedged = False
+    deadline = time.monotonic() + TASK_DEADLINES[task] if TASK_DEADLINES[task] > 0 else None
+    submit(primary)
+    while attempts:
+        timeout = None if hedged or deadline is None else max(0, deadline - time.monotonic())
+        done, _ = wait(attempts, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            model = attempts.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            _won(task, model, hedged)
+            return result, model
+        if not hedged and (not done or not attempts):
+            count("gemini_hedges_total", task=task, reason="deadline" if not done else "error")
+            hedged = True
+            submit(hedge)
+    annotate(hedged=hedged)
+    raise errors[0]
+
+
+def _analyze_cv(cv_text: str):
+    """Returns (result, model that answered); the model is None on error."""
+    prompt, prompt_tokens = _compact_prompt(cv_text, _analysis_prompt())
+    try:
+        analysis, model = _generate("analysis", prompt, _parse_analysis)
     except Exception as e:
-        return {
-            "error": f"An unexpected error occurred: {str(e)}",
-            "error_type": "unknown"
-        }
+        return _request_error(e), None
+    return {**analysis, "prompt_tokens": prompt_tokens}, model
+
 
+def _model_stream(task: str, model: str, prompt: _Prompt, priority: int, hedge: bool = False):
+    """Yield the text chunks of one model's answer as they arrive (server-sent events)."""
+    started = time.perf_counter()
+    outcome = "error"
+    resp = None
     try:
-        text = resp.json()["candidates"][0]["content"]["parts"][0]["text"]
-    except (KeyError, IndexError, json.JSONDecodeError) as e:
-        return {
-            "error": "Received invalid response from AI service. Please try again.",
-            "error_type": "response",
-            "details": str(e)
-        }
+        # Streams cannot be shared between callers; they only wait for the rate limit
+        SCHEDULER.acquire("gemini", priority)
+        url = f"{_model_url(model, 'streamGenerateContent')}?alt=sse"
+        body = prompt.body(model, create=not hedge)
+        resp = http_client.post(url, endpoint="gemini", stream=True, headers=_auth_headers(), json=body)
+        if _stale_context(body, resp.status_code):
+            resp.close()
+            CONTEXTS.expired(prompt.context, model)
+            resp = http_client.post(url, endpoint="gemini", stream=True, headers=_auth_headers(), json=prompt.body(model, create=False))
+        resp.raise_for_status()
+        for raw in resp.iter_lines():
+            line = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+            if not line.startswith("data:"):
+                continue
+            chunk = json.loads(line[5:])
+            for part in chunk["candidates"][0].get("content", {}).get("parts", []):
+                if part.get("text"):
+                    outcome = "cancelled"
+                    yield part["text"]
+                    outcome = "error"
+        outcome = "ok"
+    finally:
+        if resp is not None:
+            resp.close()
+        observe("gemini_request_duration_seconds", time.perf_counter() - started, task=task, model=model, outcome=outcome)
+
+
+def _stream_text(prompt: _Prompt, task: str, priority: int = PRIORITY_HIGH, answered: dict = None):
+    """
+    Yield the text chunks of the task model's answer. Hedged like _generate,
+    except that a stream wins with its first chunk: once text has been
+    yielded, a failure of that stream is raised. The winning model is put
+    in answered["model"].
+    """
+    answered = {} if answered is None else answered
+    primary = TASK_MODELS[task]
+    hedge = _hedge_model(task)
+    if hedge is None:
+        answered["model"] = primary
+        yield from _model_stream(task, primary, prompt, priority)
+        _won(task, primary, False)
+        return
+
+    # Each stream is read on a worker thread into one queue of (model, chunk, error);
+    # chunk None without an error marks the end of a stream
+    events = queue.Queue()
+    stopped = threading.Event()
+    winner = None
+
+    def pump(model):
+        stream = _model_stream(task, model, prompt, priority, model != primary)
+        try:
+            for chunk in stream:
+                if stopped.is_set() or winner not in (None, model):
+                    return
+                events.put((model, chunk, None))
+            events.put((model, None, None))
+        except Exception as e:
+            events.put((model, None, e))
+        finally:
+            stream.close()
+
+    def start(model):
+        _EXECUTOR.submit(contextvars.copy_context().run, pump, model)
 
+    errors = []
+    hedged = False
+    deadline = time.monotonic() + TASK_DEADLINES[task] if TASK_DEADLINES[task] > 0 else None
+    start(primary)
+    try:
+        while True:
+            waiting = winner is None and not hedged and deadline is not None
+            try:
+                model, chunk, error = events.get(timeout=max(0, deadline - time.monotonic()) if waiting else None)
+            except queue.Empty:
+                count("gemini_hedges_total", task=task, reason="deadline")
+                hedged = True
+                start(hedge)
+                continue
+            if winner is None:
+                if error is not None:
+                    errors.append(error)
+                    if hedged and len(errors) == 2:
+                        raise errors[0]
+                    if not hedged:
+                        count("gemini_hedges_total", task=task, reason="error")
+                        hedged = True
+                        start(hedge)
+                    continue
+                winner = answered["model"] = model
+                _won(task, model, hedged)
+            if model != winner:
+                continue
+            if error is not None:
+                raise error
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        stopped.set()
+
+
+def _stream_lines(prompt: _Prompt, answered: dict):
+    """Yield (line, full_text_so_far) for every complete line of a streamed answer."""
+    text = ""
+    pending = ""
+    for chunk in _stream_text(prompt, "analysis", answered=answered):
+        text += chunk
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line, text
+    if pending:
+        yield pending, text
+
+
+@traced("gemini.analyze_stream", _analysis_attrs)
+def analyze_cv_stream(cv_text: str):
+    """
+    Streaming version of analyze_cv. Yields {"event": "advice", "text": ...}
+    for each advice bullet as soon as its line is complete, then exactly one
+    {"event": "done", "result": ...} carrying what analyze_cv would return.
+    """
+    if not GEMINI_KEY:
+        yield {"event": "done", "result": analyze_cv(cv_text)}
+        return
+
+    key = _analysis_key(cv_text)
+    result = _cached_analysis(key)
+    annotate(cache_hit=result is not None)
+    if result is not None:
+        yield {"event": "done", "result": result}
+        return
+
+    prompt, prompt_tokens = _compact_prompt(cv_text, _analysis_prompt())
+    text = ""
+    answered = {}
+    try:
+        for line, text in _stream_lines(prompt, answered):
+            bullet = _advice_line(line)
+            if bullet:
+                yield {"event": "advice", "text": bullet}
+    except Exception as e:
+        yield {"event": "done", "result": _request_error(e)}
+        return
+
+    result = {**_parse_analysis(text), "prompt_tokens": prompt_tokens}
+    _store_analysis(key, result, answered.get("model"))
+    yield {"event": "done", "result": result}
+
+
+def _advice_line(line: str):
+    """The advice bullet on this line, or None if it is not one."""
+    line = line.strip()
+    # Check if line starts with an emoji or contains an emoji followed by text
+    if any(emoji in line[:2] for emoji in ADVICE_EMOJIS):
+        # Remove any leading dashes or asterisks
+        return line.lstrip('-*• ')
+    return None
+
+
+def _parse_analysis(text: str) -> dict:
     # Try parse job titles (JSON array)
     job_titles = []
     try:
@@ -75,14 +526,7 @@ def analyze_cv(cv_text: str) -> dict:
         ]
 
     # Extract advice points (lines containing emojis)
-    advice_bullets = []
-    for line in text.splitlines():
-        line = line.strip()
-        # Check if line starts with an emoji or contains an emoji followed by text
-        if any(emoji in line[:2] for emoji in ["🎯", "💡", "📚", "🚀", "🎓", "💼", "🌟", "📈", "🎨", "🔍", "🧭", "🗨", "🎮", "🌐", "📱"]):
-            # Remove any leading dashes or asterisks
-            line = line.lstrip('-*• ')
-            advice_bullets.append(line)
+    advice_bullets = [b for b in map(_advice_line, text.splitlines()) if b]
 
     # If no advice was found, try to extract any numbered points
     if not advice_bullets:
@@ -90,24 +534,13 @@ def analyze_cv(cv_text: str) -> dict:
             line = line.strip()
             if line.startswith(('1.', '2.', '3.', '4.', '5.', '6.', '7.', '8.')):
                 # Add a default emoji if none is present
-                if not any(emoji in line for emoji in ["🎯", "💡", "📚", "🚀", "🎓", "💼", "🌟", "📈", "🎨", "🔍", "🧭", "🗨", "🎮", "🌐", "📱"]):
+                if not any(emoji in line for emoji in ADVICE_EMOJIS):
                     line = "💡 " + line
                 advice_bullets.append(line)
 
     # Ensure we have exactly 8 points, pad with default if needed
-    default_advice = [
-        "🎯 Set clear career goals and milestones",
-        "💡 Focus on building relevant technical skills",
-        "📚 Consider additional certifications or training",
-        "🚀 Look for growth opportunities in your current role",
-        "💼 Network and build professional connections",
-        "🎮 Build a portfolio of personal projects",
-        "🌐 Stay updated with industry trends and technologies",
-        "📱 Develop both technical and soft skills"
-    ]
-    
     while len(advice_bullets) < 8:
-        advice_bullets.append(default_advice[len(advice_bullets)])
+        advice_bullets.append(DEFAULT_ADVICE[len(advice_bullets)])
 
     return {
         "job_titles": job_titles,
@@ -116,38 +549,246 @@ def analyze_cv(cv_text: str) -> dict:
         "advice_markdown": "\n".join(f"- {a}" for a in advice_bullets[:8]) or "- No advice found."
     }
 
-def match_jobs_with_ai(cv_text, selected_title, jobs, top_n=3):
+@dataclass(frozen=True)
+class JobMatch:
+    """One recommended job: `index` points into the `jobs` list that was matched."""
+    index: int
+    job: Job
+    score: float
+    reason: str
+
+
+def _local_matches(jobs: list[dict], ranked: list[tuple[int, float]], top_n: int, reason: str) -> dict:
+    """Top N by local similarity score, in the same shape as the AI result."""
+    matches = [
+        JobMatch(i, jobs[i], round(score * 100, 1), "Closest match to your CV and selected title")
+        for i, score in ranked[:top_n]
+    ]
+    return {"matches": matches, "ranking": "local", "warning": reason}
+
+
+def _reindex(result: dict, jobs: list[dict]) -> dict:
+    # A ranking cached for a superset of jobs: point its indices into this list
+    positions = {job.get('link'): i for i, job in enumerate(jobs)}
+    matches = [
+        JobMatch(positions[m.job.get('link')], m.job, m.score, m.reason)
+        for m in result["matches"]
+    ]
+    return {**result, "matches": matches}
+
+
+def _lookup_match(prefix: tuple, links: frozenset):
     """
-    Use Gemini to select and explain the top N jobs for the user.
-    Returns a markdown-formatted string with the AI's recommendations.
+    Find a cached ranking for this CV/title/top_n that can serve `links`:
+    either the exact same job set, or a superset whose picks all survived
+    the filters (the top picks of a superset are also the top of the subset).
+    """
+    def usable(key, entry):
+        if key[0] != prefix:
+            return False
+        if key[1] == links:
+            return True
+        return bool(entry["picks"]) and links <= key[1] and set(entry["picks"]) <= links
+
+    found = MATCH_CACHE.find(usable)
+    return found[1]["result"] if found else None
+
+
+def _match_prompt(selected_title, job_list_str, top_n) -> str:
+    return (
+        f"The user is interested in: {selected_title}\n\n"
+        f"Here are some job postings:\n{job_list_str}\n\n"
+        f"Select the top {top_n} jobs that best match the user's profile and interest, best first. "
+        f"Answer with a JSON array; for each job give its number from the list above as \"index\", "
+        f"a fit \"score\" from 0 to 100 and a one-sentence \"reason\" explaining why it is a good fit."
+    )
+
+
+def _match_plan(cv_text, selected_title, jobs, top_n):
+    """
+    Everything match_jobs_with_ai needs before the API call. Has a "result"
+    key when no call is needed (cached ranking, or local fallback).
     """
+    from .ranking import rank_jobs  # NumPy is only loaded once matching is used
+    annotate(jobs=len(jobs), top_n=top_n)
     if not GEMINI_KEY:
-        return {"error": "GEMINI_API_KEY missing in .env"}
+        ranked = rank_jobs(cv_text, selected_title, jobs)
+        return {"result": _local_matches(jobs, ranked, top_n, "GEMINI_API_KEY missing in .env")}
+
+    # Before ranking: a cached rerun should not pay for the TF-IDF pass
+    prefix = (text_hash(cv_text), selected_title, top_n, TASK_MODELS["match"])
+    links = frozenset(job.get('link') for job in jobs)
+    cached = _lookup_match(prefix, links)
+    annotate(cache_hit=cached is not None)
+    if cached is not None:
+        return {"result": _reindex(cached, jobs)}
 
-    # Build job list string for the prompt
+    ranked = rank_jobs(cv_text, selected_title, jobs)
+
+    # Build job list string for the prompt from the local shortlist
+    shortlist = [i for i, _ in ranked[:max(PRERANK_TOP_K, top_n)]]
+    annotate(shortlist=len(shortlist))
     job_list_str = ""
-    for i, job in enumerate(jobs, 1):
+    for n, i in enumerate(shortlist, 1):
+        job = jobs[i]
         job_list_str += (
-            f"{i}. Title: {job.get('title', '-')[:60]}\n"
+            f"{n}. Title: {job.get('title', '-')[:60]}\n"
             f"   Description: {job.get('desc', '-')[:200]}\n"
             f"   Location: {job.get('location', '-')}\n"
             f"   Type: {job.get('type', '-')}\n"
             f"   Source: {job.get('source', '-')}\n"
         )
 
-    prompt = (
-        f"Here is a user's CV:\n{cv_text}\n\n"
-        f"The user is interested in: {selected_title}\n\n"
-        f"Here are some job postings:\n{job_list_str}\n\n"
-        f"Please select the top {top_n} jobs that best match the user's profile and interest. "
-        f"For each, explain why it is a good fit. Organize the results clearly as markdown."
-    )
+    prompt, prompt_tokens = _compact_prompt(cv_text, _match_prompt(selected_title, job_list_str, top_n))
+    return {
+        "prompt": prompt,
+        "prompt_tokens": prompt_tokens,
+        "jobs": jobs,
+        "shortlist": shortlist,
+        "ranked": ranked,
+        "top_n": top_n,
+        "cache_key": (prefix, links),
+    }
+
+
+def _generation_config(max_output_tokens: int = None) -> dict:
+    return {
+        "responseMimeType": "application/json",
+        "responseSchema": MATCH_RESPONSE_SCHEMA,
+        "maxOutputTokens": max_output_tokens or MATCH_MAX_OUTPUT_TOKENS,
+    }
+
 
-    url = f"{BASE_URL}?key={GEMINI_KEY}"
+def _to_match(plan: dict, item: dict, seen: set):
+    """JobMatch for one {"index", "score", "reason"} object, or None if unusable."""
     try:
-        resp = requests.post(url, json={"contents":[{"parts":[{"text":prompt}]}]})
-        resp.raise_for_status()
-        text = resp.json()["candidates"][0]["content"]["parts"][0]["text"]
-        return {"ai_job_matches": text}
+        n = int(item["index"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not 1 <= n <= len(plan["shortlist"]):
+        return None
+    i = plan["shortlist"][n - 1]
+    if i in seen:
+        return None
+    seen.add(i)
+    return JobMatch(i, plan["jobs"][i], float(item.get("score") or 0), str(item.get("reason", "")))
+
+
+def _matches(plan: dict, items: list) -> list:
+    seen = set()
+    matches = [m for m in (_to_match(plan, item, seen) for item in items) if m][:plan["top_n"]]
+    if not matches:
+        raise ValueError("no valid job indices in AI response")
+    return matches
+
+
+def _finish_match(plan: dict, matches: list, model: str) -> dict:
+    result = {"matches": matches, "prompt_tokens": plan["prompt_tokens"]}
+    # Like analyses, only the match model's own rankings are reused
+    if model == TASK_MODELS["match"]:
+        MATCH_CACHE.set(plan["cache_key"], {"result": result, "picks": [m.job.get('link') for m in matches]})
+    return result
+
+
+def _parse_json_array(text: str) -> list:
+    # Models occasionally wrap the JSON in a markdown fence despite the mime type
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    items = json.loads(text)
+    return items if isinstance(items, list) else []
+
+
+@traced("gemini.match", _match_attrs)
+def match_jobs_with_ai(cv_text, selected_title, jobs, top_n=3, max_output_tokens=None):
+    """
+    Use Gemini to select and explain the top N jobs for the user.
+    Returns {"matches": [JobMatch, ...]}, best first; each match's `index`
+    points into `jobs`. Gemini answers with a JSON schema of job numbers, so
+    no text matching is needed. Results are memoized in MATCH_CACHE, so
+    Streamlit reruns and filter changes that keep the AI picks visible do
+    not call the API again.
+    """
+    plan = _match_plan(cv_text, selected_title, jobs, top_n)
+    if "result" in plan:
+        return plan["result"]
+
+    try:
+        # An answer without a usable pick counts as invalid, so a hedged call can still win
+        matches, model = _generate(
+            "match", replace(plan["prompt"], generation_config=_generation_config(max_output_tokens)),
+            lambda text: _matches(plan, _parse_json_array(text)),
+        )
+        return _finish_match(plan, matches, model)
+    except Exception as e:
+        return _local_matches(jobs, plan["ranked"], top_n, f"AI job matching failed: {e}")
+
+
+def _complete_objects(text: str, pos: int):
+    """
+    Scan `text` from `pos` for complete top-level objects of a streamed JSON
+    array. Returns (objects, position to resume from).
+    """
+    objects = []
+    depth = 0
+    start = None
+    in_string = escaped = False
+    i = pos
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                try:
+                    objects.append(json.loads(text[start:i + 1]))
+                except json.JSONDecodeError:
+                    pass
+                pos = i + 1
+        i += 1
+    return objects, pos
+
+
+@traced("gemini.match_stream", _match_attrs)
+def match_jobs_with_ai_stream(cv_text, selected_title, jobs, top_n=3, max_output_tokens=None):
+    """
+    Streaming version of match_jobs_with_ai. Yields {"event": "pick", "match": JobMatch}
+    as each object of the JSON answer completes, then one {"event": "done", "result": ...}
+    carrying what match_jobs_with_ai would return.
+    """
+    plan = _match_plan(cv_text, selected_title, jobs, top_n)
+    if "result" in plan:
+        yield {"event": "done", "result": plan["result"]}
+        return
+
+    text = ""
+    pos = 0
+    seen = set()
+    items = []
+    answered = {}
+    try:
+        prompt = replace(plan["prompt"], generation_config=_generation_config(max_output_tokens))
+        for chunk in _stream_text(prompt, "match", answered=answered):
+            text += chunk
+            objects, pos = _complete_objects(text, pos)
+            for item in objects:
+                items.append(item)
+                match = _to_match(plan, item, seen)
+                if match is not None and len(seen) <= top_n:
+                    yield {"event": "pick", "match": match}
+        result = _finish_match(plan, _matches(plan, items), answered.get("model"))
     except Exception as e:
-        return {"error": f"AI job matching failed: {e}"}
+        result = _local_matches(jobs, plan["ranked"], top_n, f"AI job matching failed: {e}")
+    yield {"event": "done", "result": result}
@@ -0,0 +1,116 @@
+# cards.py
+import os
+import html
+from string import Formatter
+from .telemetry import span
+
+SOURCE_ICONS = {"linkedin": "🔗", "bayt": "💼"}
+SOURCE_COLORS = {"linkedin": "#0e4a6f", "bayt": "#4a4a00"}
+
+# Cards per page in the "All Matching Jobs" list
+CARDS_PER_PAGE = int(os.getenv("JOB_CARDS_PER_PAGE", 10))
+
+
+def _compile(template: str):
+    """
+    Split a str.format template into literal/field pairs once, so rendering
+    a card is a single join instead of re-parsing the template every time.
+    """
+    parts = [(literal, field) for literal, field, _, _ in Formatter().parse(template)]
+
+    def render(fields: dict) -> str:
+        return "".join(literal + (fields[field] if field is not None else "") for literal, field in parts)
+
+    return render
+
+
+_TOP_CARD = _compile("""
+<div class='job-card' style='border:3px solid #00ffff; background: linear-gradient(135deg, #0a3d62 60%, #00aaff 100%); box-shadow: 0 4px 16px rgba(0,255,255,0.18); position:relative;'>
+    <div style='position:absolute; top:10px; right:10px; background-color:#00ffff; color:#0a3d62; padding:4px 8px; border-radius:4px; font-weight:bold; font-size:0.8em;'>
+        ⭐ Top AI Match
+    </div>
+    <h4 style='margin:0 0 0.5rem 0; font-size:1.3rem; padding-right:100px;'>
+        <a href="{link}" target="_blank" style='color:#00ffff; text-decoration:none;'>{title}</a>
+    </h4>
+    <div style='margin:0.25rem 0; font-size:0.9em;'>
+        <span style='color:#00ffff;'>📍</span> <strong>Location:</strong> {location}
+    </div>
+    <div style='margin:0.25rem 0; font-size:0.9em;'>
+        <span style='color:#00ffff;'>💼</span> <strong>Type:</strong> {type}
+    </div>
+    <div style='margin:0.25rem 0; font-size:0.9em;'>
+        <span style='color:#00ffff;'>{icon}</span> <strong>Source:</strong> {source}
+    </div>
+    <div style='margin:0.5rem 0; font-size:0.9em; color:#cccccc; line-height:1.4;'>
+        {desc}
+    </div>
+    <div style='margin:0.5rem 0; font-size:0.9em; color:#eeeeee; line-height:1.4;'>
+        🤖 {reason}
+    </div>
+</div>""")
+
+_JOB_CARD = _compile("""
+<div class='job-card' style='border:2px solid #555; background-color:{bg};'>
+    <h4 style='margin:0 0 0.5rem 0; font-size:1.2rem;'>
+        <a href="{link}" target="_blank" style='color:#00aaff; text-decoration:none;'>{title}</a>
+    </h4>
+    <div style='margin:0.25rem 0; font-size:0.9em;'>
+        <span style='color:#aaaaaa;'>📍</span> <strong>Location:</strong> {location}
+    </div>
+    <div style='margin:0.25rem 0; font-size:0.9em;'>
+        <span style='color:#aaaaaa;'>💼</span> <strong>Type:</strong> {type}
+    </div>
+    <div style='margin:0.25rem 0; font-size:0.9em;'>
+        <span style='color:#aaaaaa;'>{icon}</span> <strong>Source:</strong> {source}
+    </div>
+    <div style='margin:0.5rem 0; font-size:0.9em; color:#cccccc; line-height:1.4;'>
+        {desc}
+    </div>
+</div>""")
+
+_GRID = "<div style='display:grid; grid-template-columns:repeat({cols}, minmax(0, 1fr)); gap:0 1.5rem;'>{cards}</div>"
+
+
+def is_renderable(job) -> bool:
+    title = job.get('title') or ''
+    return bool(title and job.get('desc') and title.strip().lower() != 'jobs')
+
+
+def _fields(job, desc_limit: int) -> dict:
+    # Descriptions are already whitespace/dot-normalized at ingest (Job.from_record)
+    desc = job.get('desc', '')
+    desc = desc[:desc_limit] + '...' if len(desc) > desc_limit else desc
+    source = job.get('source', '-')
+    return {
+        "link": html.escape(job.get('link', ''), quote=True),
+        "title": html.escape(job.get('title', '')),
+        "location": html.escape(job.get('location', '-')),
+        "type": html.escape(job.get('type', '-')),
+        "source": html.escape(source),
+        "icon": SOURCE_ICONS.get(source.lower(), ""),
+        "bg": SOURCE_COLORS.get(source.lower(), "#3a404b"),
+        "desc": html.escape(desc),
+    }
+
+
+def render_top_cards(matches, cols: int = 3) -> str:
+    """One HTML block with a card per AI match (JobMatch), in a `cols`-wide grid."""
+    with span("render.cards", kind="top") as s:
+        cards = []
+        for match in matches:
+            if is_renderable(match.job):
+                fields = _fields(match.job, 180)
+                fields["reason"] = html.escape(match.reason)
+                cards.append(_TOP_CARD(fields))
+        block = _GRID.format(cols=cols, cards="".join(cards))
+        s.set(cards=len(cards), html_chars=len(block))
+        return block
+
+
+def render_job_cards(jobs, cols: int = 2) -> str:
+    """One HTML block with a card per job, in a `cols`-wide grid."""
+    with span("render.cards", kind="list") as s:
+        cards = [_JOB_CARD(_fields(job, 150)) for job in jobs if is_renderable(job)]
+        block = _GRID.format(cols=cols, cards="".join(cards))
+        s.set(cards=len(cards), html_chars=len(block))
+        return block
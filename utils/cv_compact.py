@@ -0,0 +1,105 @@
+# cv_compact.py
+import os
+import re
+
+# Default prompt budget for the CV part of a Gemini prompt (estimated tokens)
+CV_TOKEN_BUDGET = int(os.getenv("CV_TOKEN_BUDGET", 2000))
+
+# Rough chars-per-token ratio for English text with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+# Section name -> heading pattern; first match wins
+SECTION_PATTERNS = {
+    "summary": re.compile(r"^(professional\s+)?(summary|profile|objective|about me)$"),
+    "experience": re.compile(r"^((work|professional|relevant)\s+)?(experience|employment( history)?|work history|career history)$"),
+    "skills": re.compile(r"^((technical|core|key|soft|hard)\s+)?(skills|competencies|technologies|tools)(\s+&\s+\w+)?$"),
+    "projects": re.compile(r"^(personal\s+|academic\s+)?projects$"),
+    "education": re.compile(r"^(education|academic background|qualifications)$"),
+    "certifications": re.compile(r"^(certifications?|certificates|courses|training)$"),
+    "languages": re.compile(r"^languages?$"),
+    "contact": re.compile(r"^(contact( info(rmation)?)?|personal (details|information)|references|interests|hobbies)$"),
+}
+
+# Lowest-value sections are trimmed first when over budget
+SECTION_PRIORITY = ["skills", "experience", "summary", "projects", "education", "certifications", "other", "languages", "contact"]
+
+_SPACES_RE = re.compile(r"[ \t\u00a0]+")
+_PAGE_MARKER_RE = re.compile(r"^(page\s+)?\d+(\s+(of|/)\s+\d+)?$", re.IGNORECASE)
+_HEADING_STRIP_RE = re.compile(r"[^a-z& ]+")
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text or "") // CHARS_PER_TOKEN)  # Ceiling division
+
+
+def _clean_lines(text: str) -> list[str]:
+    """Collapse whitespace, drop page markers and repeated long lines (headers/footers)."""
+    lines = []
+    seen = set()
+    for raw in (text or "").splitlines():
+        line = _SPACES_RE.sub(" ", raw).strip()
+        if not line or _PAGE_MARKER_RE.match(line):
+            continue
+        # Short lines (dates, bullets) legitimately repeat; long ones are boilerplate
+        if len(line) >= 20:
+            key = line.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+        lines.append(line)
+    return lines
+
+
+def _section_of(line: str):
+    if len(line) > 40:
+        return None
+    heading = _HEADING_STRIP_RE.sub("", line.lower()).strip()
+    for name, pattern in SECTION_PATTERNS.items():
+        if pattern.match(heading):
+            return name
+    return None
+
+
+def split_sections(lines: list[str]) -> list[tuple[str, list[str]]]:
+    """Group lines into (section name, lines) in document order; the heading line is kept."""
+    sections = [("other", [])]
+    for line in lines:
+        name = _section_of(line)
+        if name:
+            sections.append((name, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(name, body) for name, body in sections if body]
+
+
+def compact_cv(text: str, budget: int = None) -> dict:
+    """
+    Shrink CV text for a prompt: normalize whitespace, drop duplicate lines,
+    and cut the lowest-priority sections (from their end) until the estimate
+    fits `budget` tokens. Returns {"text", "tokens_before", "tokens_after",
+    "sections"} where sections lists the detected section names in order.
+    """
+    budget = CV_TOKEN_BUDGET if budget is None else budget
+    sections = split_sections(_clean_lines(text))
+    # +1 per line for the newline joining it
+    sizes = [[len(line) + 1 for line in body] for _, body in sections]
+    over = sum(map(sum, sizes)) - budget * CHARS_PER_TOKEN
+
+    rank = {name: i for i, name in enumerate(SECTION_PRIORITY)}
+    for idx in sorted(range(len(sections)), key=lambda i: -rank.get(sections[i][0], len(rank))):
+        if over <= 0:
+            break
+        body = sections[idx][1]
+        while body and over > 0:
+            body.pop()
+            over -= sizes[idx].pop()
+
+    # A heading whose content was all cut carries no information
+    kept = [(name, body) for name, body in sections if body and (name == "other" or len(body) > 1)]
+    compacted = "\n".join(line for _, body in kept for line in body)
+    return {
+        "text": compacted,
+        "tokens_before": estimate_tokens(text),
+        "tokens_after": estimate_tokens(compacted),
+        "sections": [name for name, _ in kept],
+    }
@@ -0,0 +1,178 @@
+# cv_context.py
+import os
+import time
+import threading
+from collections import OrderedDict
+from . import http_client
+from .cache import text_hash
+from .cv_compact import compact_cv
+from .settings import settings
+from .telemetry import count, span
+
+# "prefix": every prompt about a CV starts with the same CV part, sent inline.
+# "remote": a CV used a second time with a model is registered as Gemini cached
+# content (cachedContents), and later calls send only their own instructions.
+# Registration runs in the background; until it succeeds calls fall back to "prefix".
+CV_CONTEXT_MODE = os.getenv("CV_CONTEXT_MODE", "prefix")
+# The API refuses cached contents below this size (tokens; 32,768 for the 1.5
+# models), so smaller CVs are never registered. Needs CV_TOKEN_BUDGET above it.
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", 32768))
+# Lifetime of a registered CV; renewed when a call finds less than CONTEXT_CACHE_RENEW left
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", 1800))
+CONTEXT_CACHE_RENEW = int(os.getenv("CONTEXT_CACHE_RENEW", 300))
+# After a failed registration, stay inline this many seconds before trying again
+CONTEXT_CACHE_RETRY_AFTER = int(os.getenv("CONTEXT_CACHE_RETRY_AFTER", 600))
+# CVs kept per process; an evicted CV's cached contents are deleted upstream
+CV_CONTEXT_MAX_ENTRIES = int(os.getenv("CV_CONTEXT_MAX_ENTRIES", 64))
+
+CACHED_CONTENTS_ROOT = f"{settings.gemini_base_url}/v1beta"
+
+
+class CVContext:
+    """One CV, compacted once, as the leading part of every prompt about it."""
+    __slots__ = ("key", "prefix", "tokens_before", "tokens_after", "uses", "remote", "failed", "pending", "lock")
+
+    def __init__(self, key: str, compact: dict):
+        self.key = key
+        self.prefix = "Here is the user's CV:\n" + compact["text"]
+        self.tokens_before = compact["tokens_before"]
+        self.tokens_after = compact["tokens_after"]
+        self.uses = {}     # model -> calls so far
+        self.remote = {}   # model -> (cachedContents name, expiry on the monotonic clock)
+        self.failed = {}   # model -> when registration last failed (monotonic)
+        self.pending = set()  # models being registered or renewed
+        self.lock = threading.Lock()
+
+
+class ContextStore:
+    """
+    CV contexts shared by every session, keyed by a hash of the CV text, with
+    the lifetime of their cachedContents (remote mode): registered on the
+    second use per model, renewed before they lapse, deleted on eviction.
+    """
+
+    def __init__(self, mode: str, max_entries: int):
+        self.mode = mode
+        self.max_entries = max_entries
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cv_text: str) -> CVContext:
+        key = text_hash(cv_text)
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is not None:
+                self._contexts.move_to_end(key)
+                return context
+        compact = compact_cv(cv_text)
+        evicted = []
+        with self._lock:
+            context = self._contexts.setdefault(key, CVContext(key, compact))
+            self._contexts.move_to_end(key)
+            while len(self._contexts) > self.max_entries:
+                evicted.append(self._contexts.popitem(last=False)[1])
+        for old in evicted:
+            self._release(old)
+        return context
+
+    def cached_name(self, context: CVContext, model: str, create: bool = True):
+        """
+        Name of the CV's cached content for `model`, or None to send the CV
+        inline. With `create`, starts registering or renewing it in the
+        background when due; the call itself never waits for the API.
+        """
+        if self.mode != "remote" or context.tokens_after < CONTEXT_CACHE_MIN_TOKENS:
+            return None
+        with context.lock:
+            uses = context.uses[model] = context.uses.get(model, 0) + 1
+            now = time.monotonic()
+            name, expires = context.remote.get(model, (None, 0))
+            if name and expires - now > CONTEXT_CACHE_RENEW:
+                return name
+            # Expiring soon: fine for this call while the renewal runs
+            usable = name if expires - now > 5 else None
+            if name and not usable:
+                context.remote.pop(model, None)
+            if not create or model in context.pending:
+                return usable
+            if not usable and (uses < 2 or now - context.failed.get(model, -CONTEXT_CACHE_RETRY_AFTER) < CONTEXT_CACHE_RETRY_AFTER):
+                return None
+            context.pending.add(model)
+        threading.Thread(target=self._register, args=(context, model, usable), name="context-register", daemon=True).start()
+        return usable
+
+    def _register(self, context: CVContext, model: str, name: str = None) -> None:
+        """Renew `name`, or register the CV when there is none or renewing fails."""
+        try:
+            renewed = name and self._call("renew", model, "PATCH", f"{CACHED_CONTENTS_ROOT}/{name}",
+                                          params={"updateMask": "ttl"}, json={"ttl": f"{CONTEXT_CACHE_TTL}s"}) is not None
+            if not renewed:
+                created = self._call("create", model, "POST", f"{CACHED_CONTENTS_ROOT}/cachedContents", json={
+                    "model": f"models/{model}",
+                    "contents": [{"role": "user", "parts": [{"text": context.prefix}]}],
+                    "ttl": f"{CONTEXT_CACHE_TTL}s",
+                })
+                name = created["name"] if created else None
+            with context.lock:
+                if name:
+                    context.remote[model] = (name, time.monotonic() + CONTEXT_CACHE_TTL)
+                else:
+                    context.remote.pop(model, None)
+                    context.failed[model] = time.monotonic()
+        finally:
+            with context.lock:
+                context.pending.discard(model)
+
+    def expired(self, context: CVContext, model: str) -> None:
+        """The API no longer knows the cached content: drop it and send the CV inline for a while."""
+        with context.lock:
+            context.remote.pop(model, None)
+            context.failed[model] = time.monotonic()
+        count("context_cache_total", op="expired", status="ok")
+
+    def _call(self, op: str, model: str, method: str, url: str, **kwargs):
+        """JSON answer of a cachedContents request, or None if it failed."""
+        with span("gemini.context", op=op, model=model) as s:
+            try:
+                resp = http_client.request(method, url, endpoint="gemini", retries=0,
+                                           headers={"x-goog-api-key": settings.gemini_api_key}, **kwargs)
+                s.set(status_code=resp.status_code)
+                resp.raise_for_status()
+                result = resp.json() if resp.content else {}
+            except Exception as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                print(f"Context cache {op} failed for {model}: {status or type(e).__name__}")
+                count("context_cache_total", op=op, status="error")
+                return None
+            count("context_cache_total", op=op, status="ok")
+            return result
+
+    def _release(self, context: CVContext) -> None:
+        # Stored contexts are billed per hour: delete them in the background rather than wait for the TTL
+        with context.lock:
+            names = [(model, name) for model, (name, _) in context.remote.items()]
+            context.remote.clear()
+        for model, name in names:
+            threading.Thread(
+                target=self._call, args=("delete", model, "DELETE", f"{CACHED_CONTENTS_ROOT}/{name}"),
+                name="context-delete", daemon=True,
+            ).start()
+
+    def clear(self) -> None:
+        with self._lock:
+            contexts = list(self._contexts.values())
+            self._contexts.clear()
+        for context in contexts:
+            self._release(context)
+
+    def stats(self) -> dict:
+        with self._lock:
+            contexts = list(self._contexts.values())
+        return {
+            "mode": self.mode,
+            "contexts": len(contexts),
+            "registered": sum(len(context.remote) for context in contexts),
+        }
+
+
+CONTEXTS = ContextStore(CV_CONTEXT_MODE, CV_CONTEXT_MAX_ENTRIES)
@@ -0,0 +1,119 @@
+# cv_ingest.py
+import os
+import time
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from .cache import LRUCache
+from .telemetry import span
+
+MAX_CV_BYTES = int(os.getenv("MAX_CV_BYTES", 10 * 1024 * 1024))
+MAX_CV_PAGES = int(os.getenv("MAX_CV_PAGES", 50))
+# Documents with at least this many pages are extracted page-parallel (0 = never).
+# Off by default: a text page takes ~2.7 ms, so shipping the document to worker
+# processes costs more than it saves (20 pages: 54 ms serial, 62 ms on a warm
+# pool of 4, over a second to start the pool). Only worth it for dense PDFs
+# on hosts with idle cores, after measuring.
+PARALLEL_MIN_PAGES = int(os.getenv("CV_PARALLEL_MIN_PAGES", 0))
+CV_EXTRACT_WORKERS = int(os.getenv("CV_EXTRACT_WORKERS", 4))
+
+# Extracted text by SHA-256 of the uploaded bytes, shared by all sessions
+CV_TEXT_CACHE = LRUCache(int(os.getenv("CV_TEXT_CACHE_MAX_ENTRIES", 64)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class CVTooLargeError(ValueError):
+    pass
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Never fork: the Streamlit server is multi-threaded, and a forked
+                # child can inherit a lock held by another thread and deadlock
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                _pool = ProcessPoolExecutor(max_workers=CV_EXTRACT_WORKERS, mp_context=context)
+    return _pool
+
+
+def _extract_range(data: bytes, start: int, stop: int) -> list[str]:
+    # Runs in a worker process: each worker opens its own copy of the document
+    import fitz  # PyMuPDF
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
+
+def _parallel(pages: int) -> bool:
+    return 0 < PARALLEL_MIN_PAGES <= pages and (os.cpu_count() or 1) > 1
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def extract_cv_text(data: bytes) -> dict:
+    """
+    Extract the text of a PDF CV. Returns {"text", "pages", "sha256",
+    "cached", "parallel", "timings"}; timings are in milliseconds.
+    Results are cached by the hash of the bytes, so reruns with the same
+    upload skip PyMuPDF.
+    Raises CVTooLargeError when the byte or page limit is exceeded.
+    """
+    with span("cv.extract", bytes=len(data)) as s:
+        result = _extract_cv_text(data)
+        s.set(pages=result["pages"], chars=len(result["text"]), cache_hit=result["cached"], parallel=result["parallel"])
+        return result
+
+
+def _extract_cv_text(data: bytes) -> dict:
+    started = time.perf_counter()
+    if len(data) > MAX_CV_BYTES:
+        raise CVTooLargeError(f"CV is larger than {MAX_CV_BYTES // (1024 * 1024)} MB.")
+
+    digest = hashlib.sha256(data).hexdigest()
+    hashed = time.perf_counter()
+    cached = CV_TEXT_CACHE.get(digest)
+    if cached is not None:
+        return {
+            **cached,
+            "cached": True,
+            "parallel": False,
+            "timings": {"hash_ms": _ms(hashed - started), "total_ms": _ms(time.perf_counter() - started)},
+        }
+
+    import fitz  # PyMuPDF
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        pages = doc.page_count
+        if pages > MAX_CV_PAGES:
+            raise CVTooLargeError(f"CV has {pages} pages; the limit is {MAX_CV_PAGES}.")
+        opened = time.perf_counter()
+        parallel = _parallel(pages)
+        texts = None if parallel else [page.get_text() for page in doc]
+    if parallel:
+        step = -(-pages // CV_EXTRACT_WORKERS)  # Ceiling division
+        futures = [
+            _get_pool().submit(_extract_range, data, start, min(start + step, pages))
+            for start in range(0, pages, step)
+        ]
+        texts = [text for f in futures for text in f.result()]
+    extracted = time.perf_counter()
+
+    entry = {"text": "\n".join(texts), "pages": pages, "sha256": digest}
+    CV_TEXT_CACHE.set(digest, entry)
+    return {
+        **entry,
+        "cached": False,
+        "timings": {
+            "hash_ms": _ms(hashed - started),
+            "open_ms": _ms(opened - hashed),
+            "extract_ms": _ms(extracted - opened),
+            "total_ms": _ms(extracted - started),
+        },
+        "parallel": parallel,
+    }
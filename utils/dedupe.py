@@ -0,0 +1,134 @@
+# dedupe.py
+import re
+from urllib.parse import urlsplit
+
+_WORD_RE = re.compile(r"\w+")
+# "touch hiring Data Analyst in Beirut, Lebanon | LinkedIn"
+_HIRING_TITLE_RE = re.compile(r"^(?P<company>.+?) hiring (?P<role>.+?)(?: in (?P<place>[^|]+?))?\s*(?:\|.*)?$", re.I)
+# "Data Analyst at touch - Beirut | Bayt.com"
+_AT_TITLE_RE = re.compile(r"^(?P<role>.+?) at (?P<company>.+?)(?: - (?P<place>[^|]+?))?\s*(?:\|.*)?$", re.I)
+# linkedin.com/jobs/view/data-analyst-at-touch-3301595691, for titles that name no company
+_SLUG_RE = re.compile(r"/jobs/view/(?P<role>[a-z0-9-]+?)-at-(?P<company>[a-z0-9-]+?)-\d{5,}")
+# Legal-form words dropped from the end of company names ("BLOM Bank s.a.l.")
+_COMPANY_SUFFIXES = {"sal", "sarl", "llc", "ltd", "inc", "plc", "co"}
+_TRAILING_ID_RE = re.compile(r"-(\d{5,})/?$")
+# lb.linkedin.com, www.linkedin.com, m.bayt.com ... -> linkedin.com, bayt.com
+_HOST_PREFIX_RE = re.compile(r"^(?:www\.|m\.|[a-z]{2}\.)(?=[^.]+\.[^.]+$)")
+
+
+def canonical_url(url: str) -> str:
+    """
+    Scheme-, query- and subdomain-free form of a job URL. LinkedIn and Bayt
+    postings reduce to their numeric job ID, so slug, language and tracking
+    variants of one posting compare equal.
+    """
+    parts = urlsplit((url or "").strip().lower())
+    host = _HOST_PREFIX_RE.sub("", parts.netloc.split(":")[0])
+    path = parts.path.rstrip("/")
+    job_id = _TRAILING_ID_RE.search(path)
+    if host == "linkedin.com" and "/jobs/view/" in path and job_id:
+        return f"linkedin.com/jobs/view/{job_id[1]}"
+    if host == "bayt.com" and "/jobs/" in path and job_id:
+        return f"bayt.com/jobs/{job_id[1]}"
+    return host + path
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_RE.findall((text or "").replace(".", "").replace("-", " ").lower())
+
+
+def _company(text: str) -> str:
+    words = _words(text)
+    while len(words) > 1 and words[-1] in _COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def _known(value):
+    return value if value and value.lower() != "unknown" else None
+
+
+def posting_key(job):
+    """
+    (role, company, place) named by a job's title, in the LinkedIn
+    "<company> hiring <role> in <place>" or Bayt "<role> at <company> - <place>"
+    form, else by a LinkedIn URL slug. Place is the first part of the
+    location, or None if unknown; the whole key is None without a company.
+    """
+    title = job.get("title") or ""
+    match = _HIRING_TITLE_RE.match(title) or _AT_TITLE_RE.match(title)
+    if match is None:
+        match = _SLUG_RE.search((job.get("link") or "").lower())
+        place = None if match is None else job.get("location")
+    else:
+        place = match["place"]
+    if match is None:
+        return None
+    place = " ".join(_words((place or "").split("|")[0].split(",")[0]))
+    return " ".join(_words(match["role"])), _company(match["company"]), _known(place)
+
+
+def _richness(job) -> tuple:
+    known = sum(1 for key in ("location", "type") if (job.get(key) or "Unknown") != "Unknown")
+    return (known, len(job.get("desc") or ""), len(job.get("title") or ""))
+
+
+def cluster_duplicates(jobs: list) -> list[list[int]]:
+    """
+    Group indices of `jobs` that are the same posting: equal canonical URL, or
+    the same role at the same company (see posting_key) on another board,
+    where neither the place nor the job type differ. Clusters come in order
+    of their first member; members are in input order.
+    """
+    parent = list(range(len(jobs)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        i, j = find(i), find(j)
+        if i != j:
+            parent[max(i, j)] = min(i, j)
+
+    by_url = {}
+    urls = [canonical_url(job.get("link")) for job in jobs]
+    for i, url in enumerate(urls):
+        if url in by_url:
+            union(by_url[url], i)
+        else:
+            by_url[url] = i
+
+    # Cross-board copies rarely share snippet text, but keep the title's role
+    # and company; only postings with the same pair are compared. On one board
+    # a different job ID is a different posting, so only other boards match.
+    by_posting = {}
+    for i, job in enumerate(jobs):
+        key = posting_key(job)
+        if key is None:
+            continue
+        role, company, place = key
+        board = urls[i].split("/", 1)[0]
+        kind = _known(job.get("type"))
+        for j, other_board, other_place, other_kind in by_posting.setdefault((role, company), []):
+            if board == other_board or (place and other_place and place != other_place):
+                continue
+            if kind and other_kind and kind != other_kind:
+                continue
+            union(i, j)
+        by_posting[role, company].append((i, board, place, kind))
+
+    clusters = {}
+    for i in range(len(jobs)):
+        clusters.setdefault(find(i), []).append(i)
+    return list(clusters.values())
+
+
+def dedupe_jobs(jobs: list) -> list:
+    """
+    Drop near-duplicate postings, keeping the richest record of each cluster
+    (most known fields, then longest snippet) at the position of its first copy.
+    """
+    return [max((jobs[i] for i in cluster), key=_richness) for cluster in cluster_duplicates(jobs)]
@@ -0,0 +1,127 @@
+# http_client.py
+import os
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import EmptyPoolError
+from .telemetry import count
+
+# (connect, read) timeouts in seconds per upstream
+TIMEOUTS = {
+    "gemini": (5, 30),
+    "cse": (5, 15),
+    "lottie": (3, 5),
+    "default": (5, 20),
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", 0.5))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", 8))
+# urllib3 keeps one pool per host; pool_block makes this a hard cap on open connections
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 8))
+# Longest a request waits for a free connection under that cap (streams hold
+# theirs for their whole duration) before failing with a Timeout
+POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", 10))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class _BoundedWait:
+    # requests never passes pool_timeout, and urllib3's default waits forever
+    def urlopen(self, *args, pool_timeout=None, **kwargs):
+        return super().urlopen(*args, pool_timeout=POOL_TIMEOUT if pool_timeout is None else pool_timeout, **kwargs)
+
+
+class _HTTPPool(_BoundedWait, HTTPConnectionPool):
+    pass
+
+
+class _HTTPSPool(_BoundedWait, HTTPSConnectionPool):
+    pass
+
+
+class _Adapter(HTTPAdapter):
+    """HTTPAdapter whose blocking pools wait at most POOL_TIMEOUT for a connection."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPPool, "https": _HTTPSPool}
+
+    def send(self, request, *args, **kwargs):
+        try:
+            return super().send(request, *args, **kwargs)
+        except EmptyPoolError as e:
+            raise requests.exceptions.Timeout(f"No free connection within {POOL_TIMEOUT}s: {e}", request=request)
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session shared by every caller."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = _Adapter(
+                    pool_connections=16,
+                    pool_maxsize=MAX_CONNECTIONS_PER_HOST,
+                    pool_block=True,
+                    max_retries=0,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _backoff_delay(attempt: int, resp=None) -> float:
+    # Honour Retry-After when the server sends a number of seconds
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+    # Full jitter: uniform in [0, base * 2^attempt]
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(method: str, url: str, endpoint: str = "default", retries: int = None, **kwargs) -> requests.Response:
+    """
+    Send a request on the shared session with the endpoint's timeout.
+    429/5xx responses and connection failures are retried with jittered
+    exponential backoff; read timeouts are not retried. The last response is
+    returned as-is, so callers still call raise_for_status().
+    """
+    kwargs.setdefault("timeout", TIMEOUTS.get(endpoint, TIMEOUTS["default"]))
+    retries = MAX_RETRIES if retries is None else retries
+    session = get_session()
+    attempt = 0
+    while True:
+        try:
+            resp = session.request(method, url, **kwargs)
+        except requests.exceptions.ConnectionError:
+            count("http_requests_total", endpoint=endpoint, status="connection_error")
+            if attempt >= retries:
+                raise
+            count("http_retries_total", endpoint=endpoint)
+            time.sleep(_backoff_delay(attempt))
+            attempt += 1
+            continue
+        count("http_requests_total", endpoint=endpoint, status=str(resp.status_code))
+        if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+            return resp
+        count("http_retries_total", endpoint=endpoint)
+        time.sleep(_backoff_delay(attempt, resp))
+        resp.close()
+        attempt += 1
+
+
+def get(url: str, endpoint: str = "default", **kwargs) -> requests.Response:
+    return request("GET", url, endpoint=endpoint, **kwargs)
+
+
+def post(url: str, endpoint: str = "default", **kwargs) -> requests.Response:
+    return request("POST", url, endpoint=endpoint, **kwargs)
@@ -0,0 +1,234 @@
+# job_index.py
+import os
+import re
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from .jobs import Job
+
+# How long a fetched (source, title) query counts as fresh coverage
+JOB_INDEX_TTL = float(os.getenv("JOB_INDEX_TTL", 12 * 3600))
+# Jobs not seen in any search for this long are no longer served, and are
+# deleted (with stale coverage) at most every JOB_INDEX_PRUNE_EVERY seconds
+JOB_INDEX_MAX_AGE = float(os.getenv("JOB_INDEX_MAX_AGE", 14 * 24 * 3600))
+JOB_INDEX_PRUNE_EVERY = float(os.getenv("JOB_INDEX_PRUNE_EVERY", 3600))
+
+# Bump when the schema changes: the index is a cache, so older files are rebuilt
+SCHEMA_VERSION = 2
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _title_key(title: str) -> str:
+    return " ".join(_TOKEN_RE.findall((title or "").lower()))
+
+
+class JobIndex:
+    """
+    Persistent index of every job seen in a search, with first/last-seen
+    timestamps and an FTS5 index over title and description. A coverage
+    table records which (source, title, location) queries were fetched from
+    the network and when, so fresh queries can be answered locally.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pruned_at = 0.0
+
+    def _connect(self):
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript(
+                    "DROP TABLE IF EXISTS jobs_fts; DROP TABLE IF EXISTS jobs;"
+                    " DROP TABLE IF EXISTS coverage; DROP TABLE IF EXISTS coverage_jobs;"
+                    f" PRAGMA user_version = {SCHEMA_VERSION};"
+                )
+            # jobs_fts indexes jobs by its id (external content), kept in step by
+            # triggers, so a job is replaced or deleted by rowid, not by scanning
+            conn.executescript(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY, link TEXT NOT NULL UNIQUE, title TEXT, desc TEXT,"
+                " location TEXT, type TEXT, source TEXT, date TEXT,"
+                " first_seen REAL NOT NULL, last_seen REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS jobs_last_seen ON jobs (last_seen);"
+                "CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(title, desc, content='jobs', content_rowid='id');"
+                "CREATE TRIGGER IF NOT EXISTS jobs_ai AFTER INSERT ON jobs BEGIN"
+                " INSERT INTO jobs_fts (rowid, title, desc) VALUES (new.id, new.title, new.desc); END;"
+                "CREATE TRIGGER IF NOT EXISTS jobs_ad AFTER DELETE ON jobs BEGIN"
+                " INSERT INTO jobs_fts (jobs_fts, rowid, title, desc) VALUES ('delete', old.id, old.title, old.desc); END;"
+                "CREATE TRIGGER IF NOT EXISTS jobs_au AFTER UPDATE OF title, desc ON jobs"
+                " WHEN old.title IS NOT new.title OR old.desc IS NOT new.desc BEGIN"
+                " INSERT INTO jobs_fts (jobs_fts, rowid, title, desc) VALUES ('delete', old.id, old.title, old.desc);"
+                " INSERT INTO jobs_fts (rowid, title, desc) VALUES (new.id, new.title, new.desc); END;"
+                "CREATE TABLE IF NOT EXISTS coverage ("
+                " source TEXT, title_key TEXT, location TEXT,"
+                " fetched_at REAL NOT NULL, num INTEGER NOT NULL, complete INTEGER NOT NULL,"
+                " PRIMARY KEY (source, title_key, location));"
+                "CREATE TABLE IF NOT EXISTS coverage_jobs ("
+                " source TEXT, title_key TEXT, location TEXT, position INTEGER, link TEXT,"
+                " PRIMARY KEY (source, title_key, location, position));"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _run(self, fn, default=None):
+        # Any SQLite problem (e.g. no FTS5 in this build) disables the index
+        if not self.enabled:
+            return default
+        with self._lock:
+            try:
+                return fn(self._connect())
+            except sqlite3.Error as e:
+                print(f"Job index disabled: {e}")
+                self.enabled = False
+                return default
+
+    def is_covered(self, source: str, title: str, location: str, num: int) -> bool:
+        def query(conn):
+            row = conn.execute(
+                "SELECT fetched_at, num, complete FROM coverage"
+                " WHERE source = ? AND title_key = ? AND location = ?",
+                (source, _title_key(title), location),
+            ).fetchone()
+            if row is None or time.time() - row[0] > JOB_INDEX_TTL:
+                return False
+            return bool(row[2]) or row[1] >= num
+
+        covered = self._run(query, False)
+        if covered:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return covered
+
+    def mark_covered(self, source: str, title: str, location: str, links: list[str], num: int, complete: bool) -> None:
+        """Record that this query was fetched from the network and returned `links`."""
+        key = (source, _title_key(title), location)
+
+        def write(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?, ?, ?)",
+                key + (time.time(), num, int(complete)),
+            )
+            conn.execute(
+                "DELETE FROM coverage_jobs WHERE source = ? AND title_key = ? AND location = ?", key
+            )
+            conn.executemany(
+                "INSERT INTO coverage_jobs VALUES (?, ?, ?, ?, ?)",
+                [key + (i, link) for i, link in enumerate(links)],
+            )
+            conn.commit()
+
+        self._run(write)
+
+    def add(self, jobs: list[dict]) -> None:
+        """Insert new jobs and refresh last_seen (and fields) of known ones."""
+        now = time.time()
+
+        def write(conn):
+            for job in jobs:
+                link = job.get("link")
+                if not link:
+                    continue
+                date = job.get("date")
+                conn.execute(
+                    "INSERT INTO jobs (link, title, desc, location, type, source, date, first_seen, last_seen)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (link) DO UPDATE SET title = excluded.title, desc = excluded.desc,"
+                    " location = excluded.location, type = excluded.type, source = excluded.source,"
+                    " date = excluded.date, last_seen = excluded.last_seen",
+                    (
+                        link, job.get("title", ""), job.get("desc", ""), job.get("location", ""),
+                        job.get("type", ""), job.get("source", ""),
+                        date.isoformat() if isinstance(date, datetime) else date, now, now,
+                    ),
+                )
+            if now - self._pruned_at > JOB_INDEX_PRUNE_EVERY:
+                self._prune(conn, now)
+            conn.commit()
+
+        self._run(write)
+
+    def _prune(self, conn, now: float) -> None:
+        """Delete jobs not seen within JOB_INDEX_MAX_AGE, and coverage that is as old or lists them."""
+        cutoff = now - JOB_INDEX_MAX_AGE
+        conn.execute("DELETE FROM jobs WHERE last_seen < ?", (cutoff,))
+        conn.execute("DELETE FROM coverage WHERE fetched_at < ?", (cutoff,))
+        conn.execute(
+            "DELETE FROM coverage_jobs WHERE NOT EXISTS (SELECT 1 FROM coverage c"
+            " WHERE c.source = coverage_jobs.source AND c.title_key = coverage_jobs.title_key"
+            " AND c.location = coverage_jobs.location)"
+            " OR link NOT IN (SELECT link FROM jobs)"
+        )
+        self._pruned_at = now
+
+    def search(self, source: str, title: str, location: str, num: int) -> list[Job]:
+        """
+        Up to `num` jobs for a query: first the jobs it returned when it was
+        last fetched (in their original order), then other jobs from `source`
+        whose title contains every word of `title`, best BM25 match first.
+        Jobs not seen within JOB_INDEX_MAX_AGE are skipped.
+        """
+        columns = "j.title, j.link, j.desc, j.location, j.type, j.date, j.source"
+        tokens = _TOKEN_RE.findall((title or "").lower())
+        match = " AND ".join(f'title : "{tok}"' for tok in tokens)
+
+        def query(conn):
+            min_seen = time.time() - JOB_INDEX_MAX_AGE
+            rows = conn.execute(
+                f"SELECT {columns} FROM coverage_jobs c JOIN jobs j ON j.link = c.link"
+                " WHERE c.source = ? AND c.title_key = ? AND c.location = ? AND j.last_seen >= ?"
+                " ORDER BY c.position LIMIT ?",
+                (source, _title_key(title), location, min_seen, num),
+            ).fetchall()
+            if len(rows) < num and match:
+                seen = {row[1] for row in rows}
+                more = conn.execute(
+                    f"SELECT {columns} FROM jobs_fts f JOIN jobs j ON j.id = f.rowid"
+                    " WHERE jobs_fts MATCH ? AND j.source = ? AND j.last_seen >= ?"
+                    " ORDER BY bm25(jobs_fts), j.last_seen DESC, j.link LIMIT ?",
+                    (match, source, min_seen, num + len(seen)),
+                ).fetchall()
+                rows += [row for row in more if row[1] not in seen][:num - len(rows)]
+            return rows
+
+        return [
+            Job.from_record({
+                "title": row[0],
+                "link": row[1],
+                "desc": row[2],
+                "location": row[3],
+                "type": row[4],
+                "date": row[5],
+                "source": row[6],
+            })
+            for row in self._run(query, [])
+        ]
+
+    def stats(self) -> dict:
+        def query(conn):
+            return (
+                conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM coverage").fetchone()[0],
+            )
+
+        jobs, queries = self._run(query, (0, 0))
+        total = self.hits + self.misses
+        return {
+            "jobs": jobs,
+            "queries": queries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "enabled": self.enabled,
+        }
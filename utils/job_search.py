@@ -1,13 +1,60 @@
 # job_search.py
 import os
-import requests
 import re
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-load_dotenv()
+from . import http_client
+from .cache import CACHE_DIR, SQLiteTTLCache, make_key
+from .job_index import JobIndex
+from .jobs import Job
+from .dedupe import dedupe_jobs
+from .settings import settings
+from .telemetry import annotate, count, span
+from .scheduler import SCHEDULER, PRIORITY_HIGH, PRIORITY_NORMAL
 
-API_KEY = os.getenv("GOOGLE_API_KEY")
-CX = os.getenv("GOOGLE_CX")
+API_KEY = settings.google_api_key
+CX = settings.google_cx
+
+# Shared on-disk cache of raw CSE responses (all sessions, survives restarts)
+CSE_CACHE = SQLiteTTLCache(
+    os.getenv("CSE_CACHE_PATH", os.path.join(CACHE_DIR, "cse_cache.sqlite3")),
+    ttl=float(os.getenv("CSE_CACHE_TTL", 6 * 3600)),
+    max_entries=int(os.getenv("CSE_CACHE_MAX_ENTRIES", 5000)),
+)
+
+# Every job ever found, answering fresh queries without a CSE round-trip
+JOB_INDEX = JobIndex(os.getenv("JOB_INDEX_PATH", os.path.join(CACHE_DIR, "job_index.sqlite3")))
+USE_JOB_INDEX = os.getenv("USE_JOB_INDEX", "1") == "1"
+# Collapse the same posting found under several URLs or on several boards
+DEDUPE_JOBS = os.getenv("DEDUPE_JOBS", "1") == "1"
+
+CSE_URL = f"{settings.cse_base_url}/customsearch/v1"
+
+# Job boards searched by search_all_jobs, in display order (domain -> source name)
+JOB_SOURCES = {
+    "linkedin.com/jobs": "LinkedIn",
+    "bayt.com": "Bayt",
+}
+
+DOMAIN_PARAMS = {
+    "linkedin.com/jobs": {
+        "q_format": "{title} {location} jobs site:linkedin.com/jobs",
+        "gl": "lb",
+        "lr": "lang_en"
+    },
+    "bayt.com": {
+        "q_format": "{title} Lebanon site:bayt.com",
+        "gl": "lb",
+        "lr": "lang_en"
+    }
+}
+
+# Bounded pool shared by all sessions for CSE fan-out
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SEARCH_MAX_WORKERS", 8)),
+    thread_name_prefix="job-search",
+)
 
 
 def parse_relative_date(text: str) -> datetime:
@@ -27,8 +74,8 @@ def clean_title(title: str) -> str:
 
 
 def parse_snippet_fields(snippet: str, title: str) -> dict:
-    # Extract location
-    location_match = re.search(r'in\s+([^,]+(?:,\s*[^,]+)*)', title)
+    # Extract location (up to a " | LinkedIn" site suffix)
+    location_match = re.search(r'in\s+([^,|]+(?:,\s*[^,|]+)*)', title)
     location = location_match.group(1) if location_match else "Unknown"
     
     # Clean up location
@@ -71,103 +118,276 @@ def parse_snippet_fields(snippet: str, title: str) -> dict:
     }
 
 
-def _search_jobs(domain: str, titles: list[str], num: int, location: str = "Lebanon"):
-    url = "https://www.googleapis.com/customsearch/v1"
-    results = []
-    
+# Precompiled patterns for parse_items_batch. Cleaning the title is one
+# combined pass equivalent to the three substitutions in clean_title.
+_TITLE_CLEAN_RE = re.compile(r'^\d+[+,]?\s*|\s*\(\d+\s*new\)$|\s*Jobs?\s*in\s*.*$')
+_LOCATION_RE = re.compile(r'in\s+([^,|]+(?:,\s*[^,|]+)*)')
+_NEW_SUFFIX_RE = re.compile(r'\s*\(\d+\s*new\)$')
+_TYPE_RE = re.compile(r'full|part|intern|contract|temporary')
+# Only "N units ago" ever yields a date in parse_snippet_fields; other forms mean "now"
+_DATE_RE = re.compile(r'(\d+)\s+(day|week|month|year)s? ago')
+
+# Checked in this order, like parse_snippet_fields
+TYPE_KEYWORDS = {
+    "full": "Full-time",
+    "part": "Part-time",
+    "intern": "Internship",
+    "contract": "Contract",
+    "temporary": "Temporary"
+}
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+
+def parse_items_batch(items: list[dict], now: datetime = None) -> list[dict]:
+    """
+    Parse a whole page of CSE items in one pass. Gives the same fields as
+    clean_title + parse_snippet_fields, but with precompiled patterns, one
+    lowercase per snippet and one "now" for the batch. Returns one
+    {"title", "link", "desc", "location", "type", "date"} record per item.
+    """
+    now = now or datetime.utcnow()
+    records = []
+    for item in items:
+        raw_title = item.get("title", "")
+        snippet = item.get("snippet", "")
+        lower = snippet.lower()
+
+        match = _LOCATION_RE.search(raw_title)
+        location = _NEW_SUFFIX_RE.sub('', match.group(1)).strip() if match else "Unknown"
+
+        found = set(_TYPE_RE.findall(lower))
+        job_type = next((name for kw, name in TYPE_KEYWORDS.items() if kw in found), "Unknown")
+
+        match = _DATE_RE.search(lower)
+        date = now - timedelta(days=_UNIT_DAYS[match[2]] * int(match[1])) if match else now
+
+        records.append({
+            "title": _TITLE_CLEAN_RE.sub('', raw_title).strip(),
+            "link": item.get("link"),
+            "desc": snippet,
+            "location": location,
+            "type": job_type,
+            "date": date,
+        })
+    return records
+
+
+def _cse_cache_key(search_params: dict) -> str:
+    query = " ".join(search_params["q"].lower().split())
+    return make_key(
+        query,
+        search_params["start"],
+        search_params["gl"],
+        search_params["lr"],
+        search_params["cx"],
+    )
+
+
+def _fetch_cse_page(url: str, search_params: dict, priority: int = None) -> dict:
+    """
+    GET one CSE page, served from CSE_CACHE when a fresh copy exists.
+    Misses go through the shared scheduler (rate limit, daily budget, one
+    in-flight request per query); first pages default to high priority.
+    """
+    if priority is None:
+        priority = PRIORITY_HIGH if search_params["start"] == 1 else PRIORITY_NORMAL
+    with span("cse.request", q=search_params["q"], start=search_params["start"], priority=priority) as s:
+        key = _cse_cache_key(search_params)
+        data = CSE_CACHE.get(key)
+        s.set(cache_hit=data is not None)
+        if data is None:
+            data = SCHEDULER.run("cse", key, lambda: _get_cse_page(url, search_params, key), priority)
+        s.set(items=len(data.get("items", [])))
+        return data
+
+
+def _get_cse_page(url: str, search_params: dict, key: str) -> dict:
+    r = http_client.get(url, endpoint="cse", params=search_params)
+    annotate(status_code=r.status_code)
+    r.raise_for_status()
+    data = r.json()
+    CSE_CACHE.set(key, data)
+    return data
+
+
+def cse_cache_stats() -> dict:
+    return CSE_CACHE.stats()
+
+
+def cse_budget_stats() -> dict:
+    return SCHEDULER.stats()["cse"]
+
+
+def job_index_stats() -> dict:
+    return JOB_INDEX.stats()
+
+
+def _domain_params(domain: str) -> dict:
     # Adjust search parameters based on domain
-    domain_params = {
-        "linkedin.com/jobs": {
-            "q_format": "{title} {location} jobs site:linkedin.com/jobs",
-            "gl": "lb",
-            "lr": "lang_en"
-        },
-        "bayt.com": {
-            "q_format": "{title} Lebanon site:bayt.com",
-            "gl": "lb",
-            "lr": "lang_en"
-        }
-    }
-    
-    # Get domain-specific parameters
-    params = domain_params.get(domain, {
+    return DOMAIN_PARAMS.get(domain, {
         "q_format": "{title} {location} site:{domain}",
         "gl": "lb",
         "lr": "lang_en"
     })
-    
-    for title in titles:
-        # Calculate how many results to fetch per query
-        queries_needed = (num + 9) // 10  # Ceiling division
-        
-        for page in range(queries_needed):
-            query = params["q_format"].format(
-                title=title,
-                location=location,
-                domain=domain
+
+
+def _build_search_params(domain: str, title: str, page: int, location: str) -> dict:
+    params = _domain_params(domain)
+    query = params["q_format"].format(
+        title=title,
+        location=location,
+        domain=domain
+    )
+    return {
+        "key": API_KEY,
+        "cx": CX,
+        "q": query,
+        # Always ask for a full page so the cached response serves any `num`
+        "num": 10,
+        "start": page * 10 + 1,
+        "gl": params["gl"],
+        "lr": params["lr"],
+        "safe": "off"
+    }
+
+
+def _parse_items(domain: str, items: list[dict]) -> list[Job]:
+    jobs = []
+    for record in parse_items_batch(items):
+        if domain == "bayt.com":
+            record["location"] = "Lebanon"
+            record["source"] = "Bayt"
+            jobs.append(Job.from_record(record))
+        else:
+            # Stricter Lebanon filter: only allow if location is exactly 'Lebanon' or 'Beirut' or similar, and exclude US states
+            location = record["location"].lower()
+            if location == "lebanon" or location == "beirut" or location.endswith(", lebanon"):
+                record["source"] = JOB_SOURCES.get(domain, "LinkedIn")
+                jobs.append(Job.from_record(record))
+    return jobs
+
+
+def _fetch_stream_page(domain: str, title: str, page: int, location: str, priority: int = None):
+    """Returns (status, jobs); status is "ok", "end" (no more results) or "error"."""
+    search_params = _build_search_params(domain, title, page, location)
+    try:
+        items = _fetch_cse_page(CSE_URL, search_params, priority).get("items", [])
+    except Exception as e:
+        print(f"Error searching {domain} for {title}: {e}")
+        return "error", []
+    if not items:
+        print(f"No results found for {search_params['q']}")
+        return "end", []
+    return "ok", _parse_items(domain, items)
+
+
+def _search_sources(domains: list[str], titles: list[str], num: int, location: str = "Lebanon", priority: int = None) -> tuple[dict, int]:
+    """Returns ({domain: jobs}, number of (domain, title) streams that failed)."""
+    with span("search", sources=len(domains), titles=len(titles), num=num) as s:
+        results, failed = _fetch_sources(domains, titles, num, location, priority)
+        s.set(results=sum(len(found) for found in results.values()))
+        return results, failed
+
+
+def _fetch_sources(domains: list[str], titles: list[str], num: int, location: str, priority: int = None) -> tuple[dict, int]:
+    """
+    Search every (domain, title) stream concurrently on the shared pool.
+    Streams with fresh coverage in JOB_INDEX are answered locally. The rest
+    are fetched in waves: wave `p` requests page `p` of every stream whose
+    source still has fewer than `num` results, so latency grows with the number
+    of pages instead of sources x titles x pages. Results are assembled in
+    (title, page) order per source, so the output does not depend on timing.
+    """
+    queries_needed = (num + 9) // 10  # Ceiling division
+    pages = {(d, t): [] for d in domains for t in titles}
+    counts = {d: 0 for d in domains}
+    active = set()
+    for s in pages:
+        source = JOB_SOURCES.get(s[0], s[0])
+        if USE_JOB_INDEX and JOB_INDEX.is_covered(source, s[1], location, num):
+            jobs = JOB_INDEX.search(source, s[1], location, num)
+            pages[s].append(jobs)
+            counts[s[0]] += len(jobs)
+        else:
+            active.add(s)
+    fetched = set(active)
+    failed = set()
+    ended = set()
+    annotate(index_streams=len(pages) - len(active), fetched_streams=len(fetched))
+
+    for page in range(queries_needed):
+        wave = [s for s in pages if s in active and counts[s[0]] < num]
+        if not wave:
+            break
+        # Each request runs in a copy of this context, so its span joins this trace
+        futures = {
+            s: _EXECUTOR.submit(contextvars.copy_context().run, _fetch_stream_page, s[0], s[1], page, location, priority)
+            for s in wave
+        }
+        for s in wave:
+            status, jobs = futures[s].result()
+            if status != "ok":
+                active.discard(s)
+                (failed if status == "error" else ended).add(s)
+                continue
+            pages[s].append(jobs)
+            counts[s[0]] += len(jobs)
+
+    annotate(failed_streams=len(failed))
+    if USE_JOB_INDEX:
+        for s in sorted(fetched - failed):
+            jobs = [job for page_jobs in pages[s] for job in page_jobs]
+            JOB_INDEX.add(jobs)
+            # Covered for `num` once every needed page was fetched; a stream cut
+            # short because other titles filled the source only covers what it got
+            covered = num if len(pages[s]) == queries_needed else len(jobs)
+            JOB_INDEX.mark_covered(
+                JOB_SOURCES.get(s[0], s[0]), s[1], location,
+                [job.link for job in jobs], covered, s in ended,
             )
-            
-            search_params = {
-                "key": API_KEY,
-                "cx": CX,
-                "q": query,
-                "num": min(10, num - len(results)),
-                "start": page * 10 + 1,
-                "gl": params["gl"],
-                "lr": params["lr"],
-                "safe": "off"
-            }
-            
-            try:
-                r = requests.get(url, params=search_params)
-                r.raise_for_status()
-                
-                items = r.json().get("items", [])
-                if not items:
-                    print(f"No results found for {query}")
-                    break
-                
-                for item in items:
-                    title = clean_title(item.get("title", ""))
-                    fields = parse_snippet_fields(item.get("snippet", ""), item.get("title", ""))
-                    link = item.get("link")
-                    if domain == "bayt.com":
-                        results.append({
-                            "title": title,
-                            "link": link,
-                            "desc": item.get("snippet", ""),
-                            "location": "Lebanon",
-                            "type": fields["type"],
-                            "date": fields["date"],
-                            "source": "Bayt"
-                        })
-                    else:
-                        # Stricter Lebanon filter: only allow if location is exactly 'Lebanon' or 'Beirut' or similar, and exclude US states
-                        location = fields["location"].lower()
-                        if location == "lebanon" or location == "beirut" or location.endswith(", lebanon"):
-                            results.append({
-                                "title": title,
-                                "link": link,
-                                "desc": item.get("snippet", ""),
-                                "location": fields["location"],
-                                "type": fields["type"],
-                                "date": fields["date"],
-                                "source": "LinkedIn"
-                            })
-                    if len(results) >= num:
-                        break
-                
-                if len(results) >= num:
-                    break
-                    
-            except Exception as e:
-                print(f"Error searching {domain} for {title}: {e}")
-                break
-    print(f"Found {len(results)} results for {domain}")
-    return results
+
+    results = {}
+    for domain in domains:
+        found = []
+        for title in titles:
+            for jobs in pages[(domain, title)]:
+                found.extend(jobs[:num - len(found)])
+        print(f"Found {len(found)} results for {domain}")
+        results[domain] = found
+    return results, len(failed)
+
+
+def _dedupe(jobs: list[Job]) -> list[Job]:
+    if not DEDUPE_JOBS or len(jobs) < 2:
+        return jobs
+    unique = dedupe_jobs(jobs)
+    if len(unique) < len(jobs):
+        print(f"Removed {len(jobs) - len(unique)} duplicate jobs")
+        count("jobs_deduplicated_total", len(jobs) - len(unique))
+    return unique
+
+
+def _search_jobs(domain: str, titles: list[str], num: int, location: str = "Lebanon"):
+    return _dedupe(_search_sources([domain], titles, num, location)[0][domain])
 
 def search_linkedin_jobs(titles, num_results=5):
     return _search_jobs("linkedin.com/jobs", titles, num_results)
 
 def search_bayt_jobs(titles, num_results=5):
     return _search_jobs("bayt.com", titles, num_results)
+
+def search_all_jobs(titles, num_results=5, sources=None, priority=None):
+    """
+    Search every job board at once and return their results concatenated in
+    JOB_SOURCES order, at most `num_results` per source, without near-duplicates. `priority` (see
+    utils.scheduler) overrides the default high/normal by page.
+    """
+    return _search_all(titles, num_results, sources, priority)[0]
+
+
+def _search_all(titles, num_results=5, sources=None, priority=None):
+    """search_all_jobs plus the number of failed streams (results may be partial)."""
+    domains = list(sources or JOB_SOURCES)
+    by_domain, failed = _search_sources(domains, titles, num_results, priority=priority)
+    # Across boards too: the first board's copy keeps its place
+    return _dedupe([job for domain in domains for job in by_domain[domain]]), failed
@@ -0,0 +1,165 @@
+# jobs.py
+import re
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+
+
+_SPACES_RE = re.compile(r'\s+')
+_DOTS_RE = re.compile(r'\.{2,}')
+
+
+def clean_desc(desc: str) -> str:
+    """Collapse whitespace and runs of dots in a snippet, once at ingest."""
+    return _DOTS_RE.sub('...', _SPACES_RE.sub(' ', desc))
+
+
+@dataclass(slots=True)
+class Job:
+    """
+    One job posting. Source, type and location are interned (a handful of
+    distinct values shared by every job) and the posting date is kept as a
+    POSIX timestamp instead of a datetime object. Descriptions are cleaned
+    here, so renderers can use them as-is.
+    Supports job.get("title") / job["title"] so mapping-style callers work.
+    """
+    title: str
+    link: str
+    desc: str
+    location: str
+    type: str
+    source: str
+    ts: float
+
+    @classmethod
+    def from_record(cls, record: dict) -> "Job":
+        date = record.get("date")
+        if isinstance(date, datetime):
+            ts = date.timestamp()
+        elif isinstance(date, str) and date:
+            ts = datetime.fromisoformat(date).timestamp()
+        else:
+            ts = datetime.utcnow().timestamp()
+        return cls(
+            title=record.get("title") or "",
+            link=record.get("link") or "",
+            desc=clean_desc(record.get("desc") or ""),
+            location=sys.intern(record.get("location") or "Unknown"),
+            type=sys.intern(record.get("type") or "Unknown"),
+            source=sys.intern(record.get("source") or "Unknown"),
+            ts=ts,
+        )
+
+    @property
+    def date(self) -> datetime:
+        return datetime.fromtimestamp(self.ts)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in _JOB_KEYS else default
+
+    def __getitem__(self, key: str):
+        if key not in _JOB_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+
+_JOB_KEYS = ("title", "link", "desc", "location", "type", "date", "source")
+
+# Low-cardinality columns the facet index covers
+_CATEGORICAL = ("location", "type", "source")
+
+
+class JobTable:
+    """
+    The jobs of one search; each job's ID is its position. Duplicates by
+    (lowercased title, link) are dropped, as are jobs without a title or
+    link. Jobs are stored as-is, so reading one allocates nothing.
+    """
+
+    def __init__(self, jobs=()):
+        self._jobs = []
+        self._facets = None
+        seen = set()
+        for job in jobs:
+            if not isinstance(job, Job):
+                job = Job.from_record(job)
+            key = (job.title.lower(), job.link)
+            if job.title and job.link and key not in seen:
+                seen.add(key)
+                self._jobs.append(job)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __iter__(self):
+        return iter(self._jobs)
+
+    def __getitem__(self, job_id: int) -> Job:
+        return self._jobs[job_id]
+
+    def facets(self) -> "FacetIndex":
+        """Facet index over the categorical columns, built on first use."""
+        if self._facets is None:
+            self._facets = FacetIndex(self._jobs)
+        return self._facets
+
+    def jobs(self, ids=None) -> list[Job]:
+        return list(self._jobs) if ids is None else [self._jobs[i] for i in ids]
+
+
+class FacetIndex:
+    """
+    For every value of location/type/source, the set of job IDs having it,
+    as an int bitset (bit i = job ID i). Filters are ORs within a column and
+    ANDs across columns; counts are popcounts, so nothing rescans the jobs.
+    """
+
+    def __init__(self, jobs: list[Job]):
+        self.size = len(jobs)
+        self.all = (1 << self.size) - 1
+        self.bits = {}
+        for col in _CATEGORICAL:
+            by_value = self.bits[col] = {}
+            for job_id, job in enumerate(jobs):
+                value = getattr(job, col)
+                by_value[value] = by_value.get(value, 0) | 1 << job_id
+
+    def values(self, col: str) -> list[str]:
+        return sorted(self.bits[col])
+
+    def _column_mask(self, col: str, values) -> int:
+        if values is None:
+            return self.all
+        mask = 0
+        for value in values:
+            mask |= self.bits[col].get(value, 0)
+        return mask
+
+    def select(self, **selected) -> int:
+        """Bitset of jobs matching every given column's selected values."""
+        mask = self.all
+        for col, values in selected.items():
+            mask &= self._column_mask(col, values)
+        return mask
+
+    @staticmethod
+    def ids(mask: int) -> list[int]:
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(low.bit_length() - 1)
+            mask ^= low
+        return ids
+
+    def counts(self, col: str, mask: int = None) -> dict[str, int]:
+        """Jobs per value of `col` within `mask` (default: all jobs)."""
+        mask = self.all if mask is None else mask
+        return {value: (bits & mask).bit_count() for value, bits in sorted(self.bits[col].items())}
+
+    def option_counts(self, col: str, **selected) -> dict[str, int]:
+        """
+        For each value of `col`, how many jobs would match with that value
+        selected, given the selections on the other columns.
+        """
+        others = {c: v for c, v in selected.items() if c != col}
+        return self.counts(col, self.select(**others))
@@ -0,0 +1,113 @@
+# lottie.py
+import os
+import json
+import time
+import threading
+from . import http_client
+from .cache import CACHE_DIR
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+LOTTIE_CACHE_DIR = os.path.join(CACHE_DIR, "lottie")
+
+# Refresh animations from their URL in the background (never on the render path)
+LOTTIE_REFRESH = os.getenv("LOTTIE_REFRESH", "1") == "1"
+LOTTIE_REFRESH_TTL = float(os.getenv("LOTTIE_REFRESH_TTL", 24 * 3600))
+
+# Animation name -> bundled file under assets/ (optional) and remote source
+LOTTIE_ASSETS = {
+    "hero": {
+        "file": "animation.json",
+        "url": "https://assets2.lottiefiles.com/packages/lf20_1pxqjqps.json",  # Job search animation
+    },
+    "upload": {
+        "file": None,
+        "url": "https://assets2.lottiefiles.com/packages/lf20_j1adxtyb.json",  # upload animation
+    },
+}
+
+# Loaded animations, shared by all sessions in the process
+_loaded = {}
+_last_refresh = {}
+_lock = threading.Lock()
+
+
+def _read_json(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if _is_lottie(data) else None
+
+
+def _is_lottie(data) -> bool:
+    return isinstance(data, dict) and "layers" in data
+
+
+def _cache_path(name: str) -> str:
+    return os.path.join(LOTTIE_CACHE_DIR, f"{name}.json")
+
+
+def _load_local(name: str):
+    """Refreshed copy from the cache dir, else the bundled asset, else None."""
+    data = _read_json(_cache_path(name))
+    if data is None and LOTTIE_ASSETS[name]["file"]:
+        data = _read_json(os.path.join(ASSETS_DIR, LOTTIE_ASSETS[name]["file"]))
+    return data
+
+
+def _refresh(name: str):
+    url = LOTTIE_ASSETS[name]["url"]
+    try:
+        r = http_client.get(url, endpoint="lottie", retries=0)
+        r.raise_for_status()
+        data = r.json()
+        if not _is_lottie(data):
+            raise ValueError("not a Lottie animation")
+        os.makedirs(LOTTIE_CACHE_DIR, exist_ok=True)
+        tmp = _cache_path(name) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, _cache_path(name))
+    except Exception as e:
+        print(f"Lottie refresh failed for {name}: {e}")
+        return
+    with _lock:
+        _loaded[name] = data
+
+
+def _maybe_refresh(name: str):
+    """Start a background refresh if the cached copy is stale and none ran recently."""
+    try:
+        age = time.time() - os.path.getmtime(_cache_path(name))
+    except OSError:
+        age = None
+    now = time.monotonic()
+    with _lock:
+        if age is not None and age < LOTTIE_REFRESH_TTL:
+            return
+        last = _last_refresh.get(name)
+        if last is not None and now - last < LOTTIE_REFRESH_TTL:
+            return
+        _last_refresh[name] = now
+    threading.Thread(target=_refresh, args=(name,), name=f"lottie-{name}", daemon=True).start()
+
+
+def load_lottie(name: str):
+    """
+    Animation JSON for a registered name, or None if none is available yet.
+    Only reads local files (once per process); a stale or missing copy is
+    refreshed from its URL in a background thread for later renders.
+    """
+    if name not in LOTTIE_ASSETS:
+        return None
+    with _lock:
+        loaded = name in _loaded
+        data = _loaded.get(name)
+    if not loaded:
+        data = _load_local(name)
+        with _lock:
+            data = _loaded.setdefault(name, data)
+    if LOTTIE_REFRESH:
+        _maybe_refresh(name)
+    return data
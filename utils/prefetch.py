@@ -0,0 +1,139 @@
+# prefetch.py
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from .job_search import _search_all
+from .scheduler import PRIORITY_LOW
+from .telemetry import count, span
+
+# Search every suggested title in the background as soon as the advice arrives
+PREFETCH_SEARCHES = os.getenv("PREFETCH_SEARCHES", "0") == "1"
+# Background searches at once; kept small so prefetching never crowds out a click
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", 2))
+# Seconds a prefetched result is served, and how many are kept (all sessions)
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", 900))
+PREFETCH_MAX_ENTRIES = int(os.getenv("PREFETCH_MAX_ENTRIES", 200))
+
+
+def _key(title: str, num_results: int) -> tuple:
+    return " ".join(title.lower().split()), num_results
+
+
+class Prefetcher:
+    """
+    Process-wide store of speculative job searches, shared by every session.
+    Prefetches run on their own small pool at PRIORITY_LOW, so they go through
+    the scheduler last and stop first when the daily CSE budget runs low.
+    """
+
+    def __init__(self, workers: int, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Separate from the search pool: a prefetch blocks on page requests
+        # that run there, so sharing it could deadlock
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (started, future of jobs or None)
+        self.lookups = {"hit": 0, "pending": 0, "miss": 0}
+
+    def _expire(self, now: float) -> None:
+        for key in [k for k, (started, _) in self._entries.items() if now - started > self.ttl]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _run(self, title: str, num_results: int):
+        with span("prefetch", title=title, num=num_results) as s:
+            try:
+                jobs, failed = _search_all([title], num_results, priority=PRIORITY_LOW)
+            except Exception as e:
+                print(f"Prefetch failed for {title!r}: {e}")
+                count("prefetch_searches_total", status="error")
+                return None
+            s.set(results=len(jobs), failed_streams=failed)
+            # A partial result would hide jobs from the user; the click searches again instead
+            status = "ok" if not failed else "incomplete"
+            count("prefetch_searches_total", status=status)
+            return jobs if status == "ok" else None
+
+    def prefetch(self, titles: list[str], num_results: int) -> int:
+        """Start background searches for titles not already prefetched. Returns how many started."""
+        started = 0
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            for title in titles:
+                key = _key(title, num_results)
+                if key in self._entries:
+                    continue
+                self._entries[key] = (now, self._executor.submit(self._run, title, num_results))
+                started += 1
+        return started
+
+    def search(self, title: str, num_results: int):
+        """
+        Jobs for `title`, from a finished prefetch when there is one. A
+        prefetch still queued or running is not waited for: the search runs
+        at once, reusing its cached and in-flight pages. Returns (jobs, prefetched).
+        """
+        key = _key(title, num_results)
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.get(key)
+            jobs = None
+            if entry is None:
+                result = "miss"
+            elif not entry[1].done():
+                # Still queued: drop it, this search replaces it
+                if entry[1].cancel():
+                    del self._entries[key]
+                result = "pending"
+            else:
+                jobs = entry[1].result()
+                result = "hit" if jobs is not None else "miss"
+                if jobs is None:
+                    del self._entries[key]  # failed prefetch: the next one may retry
+            self.lookups[result] += 1
+        count("prefetch_lookups_total", result=result)
+        if jobs is not None:
+            return jobs, True
+        return _search_all([title], num_results)[0], False
+
+    def wait(self, timeout: float = None) -> None:
+        """Block until every prefetch started so far has finished."""
+        with self._lock:
+            futures = [future for _, future in self._entries.values()]
+        wait(futures, timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = sum(self.lookups.values())
+            return {
+                **self.lookups,
+                "lookups": lookups,
+                "hit_rate": self.lookups["hit"] / lookups if lookups else None,
+                "entries": len(self._entries),
+            }
+
+
+PREFETCHER = Prefetcher(PREFETCH_WORKERS, PREFETCH_TTL, PREFETCH_MAX_ENTRIES)
+
+
+def prefetch_searches(titles: list[str], num_results: int = 5) -> int:
+    """Prefetch a search for every title, if PREFETCH_SEARCHES is on."""
+    if not PREFETCH_SEARCHES:
+        return 0
+    return PREFETCHER.prefetch(titles, num_results)
+
+
+def search_prefetched(title: str, num_results: int = 5):
+    """Same results as search_all_jobs([title], num_results), plus whether they were prefetched."""
+    if not PREFETCH_SEARCHES:
+        return _search_all([title], num_results)[0], False
+    return PREFETCHER.search(title, num_results)
+
+
+def prefetch_stats() -> dict:
+    return PREFETCHER.stats()
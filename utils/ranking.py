@@ -0,0 +1,62 @@
+# ranking.py
+import re
+import zlib
+import numpy as np
+
+# Size of the hashed feature space (word unigrams + bigrams)
+HASH_DIM = 2 ** 14
+
+# How much the CV vs. the selected title counts in the local score
+CV_WEIGHT = 0.6
+TITLE_WEIGHT = 0.4
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def _features(text: str) -> list[int]:
+    tokens = _TOKEN_RE.findall((text or "").lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    # crc32 is stable across processes, unlike hash()
+    return [zlib.crc32(g.encode("utf-8")) % HASH_DIM for g in grams]
+
+
+def _job_text(job: dict) -> str:
+    # Title counts twice: it is the strongest signal in a short snippet
+    return " ".join([
+        job.get("title", ""),
+        job.get("title", ""),
+        job.get("desc", ""),
+        job.get("type", ""),
+        job.get("location", ""),
+    ])
+
+
+def _tfidf(docs: list[str]) -> np.ndarray:
+    """Row-normalized TF-IDF matrix of hashed n-gram counts, one row per doc."""
+    counts = np.zeros((len(docs), HASH_DIM), dtype=np.float32)
+    for row, doc in enumerate(docs):
+        idx = _features(doc)
+        if idx:
+            np.add.at(counts[row], idx, 1.0)
+    df = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(docs)) / (1 + df)).astype(np.float32) + 1.0
+    matrix = np.log1p(counts) * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def score_jobs(cv_text: str, selected_title: str, jobs: list[dict]) -> np.ndarray:
+    """Cosine similarity of every job to the CV and the selected title, blended."""
+    if not jobs:
+        return np.zeros(0, dtype=np.float32)
+    matrix = _tfidf([cv_text or "", selected_title or ""] + [_job_text(j) for j in jobs])
+    cv_vec, title_vec, job_vecs = matrix[0], matrix[1], matrix[2:]
+    return CV_WEIGHT * (job_vecs @ cv_vec) + TITLE_WEIGHT * (job_vecs @ title_vec)
+
+
+def rank_jobs(cv_text: str, selected_title: str, jobs: list[dict]) -> list[tuple[int, float]]:
+    """(index into jobs, score) pairs, best first; ties keep the input order."""
+    scores = score_jobs(cv_text, selected_title, jobs)
+    order = np.argsort(-scores, kind="stable")
+    return [(int(i), float(scores[i])) for i in order]
@@ -0,0 +1,278 @@
+# scheduler.py
+import os
+import json
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from .cache import CACHE_DIR
+from .telemetry import annotate, count
+
+# Lower runs first. HIGH: what a user is waiting on (first result page, AI
+# calls); NORMAL: follow-up pages; LOW: speculative work such as prefetching.
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Requests per second and burst size per upstream (rate 0 = unlimited)
+CSE_RATE = float(os.getenv("CSE_RATE_PER_SEC", 5))
+CSE_BURST = int(os.getenv("CSE_BURST", 10))
+GEMINI_RATE = float(os.getenv("GEMINI_RATE_PER_MIN", 60)) / 60
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", 5))
+# Longest a request waits for a rate-limit token before giving up
+SCHEDULER_MAX_WAIT = float(os.getenv("SCHEDULER_MAX_WAIT", 20))
+
+# Custom Search queries per day (UTC), 0 = unlimited. Near the end of the
+# budget, lower priorities stop first: LOW once less than BUDGET_RESERVE_LOW
+# of it is left, NORMAL under BUDGET_RESERVE_NORMAL; HIGH can use it all.
+CSE_DAILY_BUDGET = int(os.getenv("CSE_DAILY_BUDGET", 100))
+BUDGET_RESERVE_LOW = float(os.getenv("BUDGET_RESERVE_LOW", 0.2))
+BUDGET_RESERVE_NORMAL = float(os.getenv("BUDGET_RESERVE_NORMAL", 0.05))
+CSE_BUDGET_PATH = os.getenv("CSE_BUDGET_PATH", os.path.join(CACHE_DIR, "cse_budget.json"))
+
+
+class QuotaExceededError(RuntimeError):
+    """A request was refused by the daily budget or timed out waiting for the rate limit."""
+
+
+class Ticket:
+    """
+    A request's place in the queue for admission. Its priority can be raised
+    while it waits, when a more urgent caller joins the same in-flight call.
+    """
+    __slots__ = ("priority", "seq", "bucket")
+
+    def __init__(self, priority: int, bucket: "TokenBucket" = None):
+        self.priority = priority
+        self.seq = 0
+        self.bucket = bucket
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def raise_to(self, priority: int) -> None:
+        if self.bucket is not None:
+            self.bucket.promote(self, priority)
+        else:
+            self.priority = min(self.priority, priority)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `burst`. Waiting
+    callers are served by priority, then in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority: int = PRIORITY_NORMAL, timeout: float = None, ticket: Ticket = None) -> bool:
+        """
+        Take one token, waiting up to `timeout` seconds. Returns False on
+        timeout. With a `ticket`, its priority is used and may be raised meanwhile.
+        """
+        if self.rate <= 0:
+            return True
+        me = ticket or Ticket(priority)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            me.seq = next(self._seq)
+            heapq.heappush(self._waiters, me)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    first = self._waiters[0] is me
+                    if first and self.tokens >= 1:
+                        self.tokens -= 1
+                        return True
+                    # Only the first waiter times its wake-up to the next token
+                    wait = (1 - self.tokens) / self.rate if first else None
+                    if deadline is not None:
+                        if now >= deadline:
+                            return False
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(me)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def promote(self, ticket: Ticket, priority: int) -> None:
+        """Raise a ticket's priority, moving it up the queue if it is waiting."""
+        with self._cond:
+            if priority < ticket.priority:
+                ticket.priority = priority
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+
+class DailyBudget:
+    """Requests allowed per UTC day, persisted to a small JSON file across restarts."""
+
+    def __init__(self, limit: int, path: str = None):
+        self.limit = limit
+        self.path = path
+        self._lock = threading.Lock()
+        self.day, self.used = self._load()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+            return saved["day"], int(saved["used"])
+        except (TypeError, OSError, ValueError, KeyError):
+            return self._today(), 0
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"day": self.day, "used": self.used}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Could not save CSE budget: {e}")
+
+    def _roll(self) -> None:
+        today = self._today()
+        if self.day != today:
+            self.day, self.used = today, 0
+
+    def reserve(self, priority: int) -> int:
+        """Requests kept back from this priority at the end of the day's budget."""
+        if priority >= PRIORITY_LOW:
+            return int(self.limit * BUDGET_RESERVE_LOW)
+        if priority >= PRIORITY_NORMAL:
+            return int(self.limit * BUDGET_RESERVE_NORMAL)
+        return 0
+
+    def try_spend(self, priority: int = PRIORITY_NORMAL, cost: int = 1) -> bool:
+        if self.limit <= 0:
+            return True
+        with self._lock:
+            self._roll()
+            if self.limit - self.used - cost < self.reserve(priority):
+                return False
+            self.used += cost
+            self._save()
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._roll()
+            return {"day": self.day, "used": self.used, "limit": self.limit,
+                    "remaining": max(0, self.limit - self.used) if self.limit > 0 else None}
+
+
+class Singleflight:
+    """Concurrent calls with the same key share the result of the first one."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, ticket: Ticket = None):
+        """
+        Returns (result, shared); `shared` is True if another caller's call was
+        reused. A joining caller's `ticket` priority is lent to the call it joins.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = (Future(), ticket)
+        future, leader_ticket = call
+        if not leader:
+            if ticket is not None and leader_ticket is not None:
+                leader_ticket.raise_to(ticket.priority)
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class Scheduler:
+    """
+    Process-wide gate in front of the upstream APIs, shared by every
+    Streamlit session: a token bucket per upstream, the daily CSE budget and
+    singleflight coalescing of identical in-flight requests.
+    """
+
+    def __init__(self):
+        self.buckets = {
+            "cse": TokenBucket(CSE_RATE, CSE_BURST),
+            "gemini": TokenBucket(GEMINI_RATE, GEMINI_BURST),
+        }
+        self.budgets = {"cse": DailyBudget(CSE_DAILY_BUDGET, CSE_BUDGET_PATH)}
+        self._flight = Singleflight()
+
+    def acquire(self, upstream: str, priority: int = PRIORITY_NORMAL, ticket: Ticket = None) -> None:
+        """
+        Admit one request to `upstream` (rate limit, then budget) or raise
+        QuotaExceededError. For calls that cannot be coalesced, e.g. streams.
+        The budget is only spent once a token is taken, so a rate-limit
+        timeout costs no query.
+        """
+        ticket = ticket or Ticket(priority)
+        bucket = self.buckets.get(upstream)
+        if bucket is not None and not bucket.acquire(timeout=SCHEDULER_MAX_WAIT, ticket=ticket):
+            count("scheduler_rejected_total", upstream=upstream, reason="rate")
+            raise QuotaExceededError(f"Timed out waiting for the {upstream} rate limit")
+        budget = self.budgets.get(upstream)
+        if budget is not None and not budget.try_spend(ticket.priority):
+            count("scheduler_rejected_total", upstream=upstream, reason="budget")
+            raise QuotaExceededError(f"Daily {upstream} budget reached for this priority")
+
+    def run(self, upstream: str, key, fn, priority: int = PRIORITY_NORMAL):
+        """
+        Run fn() once admitted. While a call with the same (upstream, key) is
+        in flight, other callers wait for its result instead of sending their
+        own, and spend no budget. A more urgent caller that joins raises the
+        call's priority, for both its place in the queue and the budget.
+        """
+        ticket = Ticket(priority, self.buckets.get(upstream))
+
+        def call():
+            self.acquire(upstream, ticket=ticket)
+            return fn()
+
+        result, shared = self._flight.do((upstream, key), call, ticket)
+        if shared:
+            count("scheduler_coalesced_total", upstream=upstream)
+            annotate(coalesced=True)
+        return result
+
+    def stats(self) -> dict:
+        return {name: budget.stats() for name, budget in self.budgets.items()}
+
+
+SCHEDULER = Scheduler()
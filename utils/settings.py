@@ -0,0 +1,46 @@
+# settings.py
+import os
+from dataclasses import dataclass
+from dotenv import load_dotenv
+
+# The only place .env is read. utils/__init__ imports this module first, so
+# every os.getenv in the package (tuning knobs next to the code they tune)
+# already sees the .env values.
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Process-wide configuration: API credentials, models, upstream base URLs
+    (point them at benchmarks/fake_server.py to run offline) and cache location.
+    """
+    gemini_api_key: str | None
+    # Per-task models (GEMINI_MODEL is the older name for the analysis one),
+    # and the faster tier that slow or failed calls fall back to
+    gemini_analysis_model: str
+    gemini_match_model: str
+    gemini_fallback_model: str | None
+    google_api_key: str | None
+    google_cx: str | None
+    cse_base_url: str
+    gemini_base_url: str
+    cache_dir: str
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            gemini_api_key=os.getenv("GEMINI_API_KEY"),
+            gemini_analysis_model=os.getenv("GEMINI_ANALYSIS_MODEL") or os.getenv("GEMINI_MODEL", "gemini-1.5-pro"),
+            gemini_match_model=os.getenv("GEMINI_MATCH_MODEL", "gemini-1.5-flash"),
+            # Empty disables the fallback
+            gemini_fallback_model=os.getenv("GEMINI_FALLBACK_MODEL", "gemini-1.5-flash") or None,
+            google_api_key=os.getenv("GOOGLE_API_KEY"),
+            google_cx=os.getenv("GOOGLE_CX"),
+            cse_base_url=os.getenv("CSE_BASE_URL", "https://www.googleapis.com").rstrip("/"),
+            gemini_base_url=os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/"),
+            cache_dir=os.getenv("MASARAK_CACHE_DIR", ".cache"),
+        )
+
+
+settings = Settings.from_env()
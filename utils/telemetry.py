@@ -0,0 +1,260 @@
+# telemetry.py
+import os
+import json
+import time
+import random
+import threading
+import inspect
+import functools
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TELEMETRY = os.getenv("TELEMETRY", "1") == "1"
+# One JSON line per finished span on stdout; off by default, it costs more
+# than the span itself and floods the log on every Streamlit rerun
+TRACE_LOG = os.getenv("TRACE_LOG", "0") == "1"
+# Serve the Prometheus text exposition on this port (off when unset)
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_PREFIX = "masarak"
+
+# Upper bounds (seconds) of the span duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_current = contextvars.ContextVar("masarak_span", default=None)
+_lock = threading.Lock()
+# (metric name, label items) -> [bucket counts..., +Inf count, sum of seconds];
+# span durations are the "span_duration_seconds" histogram
+_histograms = {}
+# (metric name, sorted label items) -> value
+_counters = {}
+_metrics_server = None
+
+
+class Span:
+    """One timed stage. Attributes end up in the log line; set them with span.set()."""
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "status", "started", "duration")
+
+    def __init__(self, name: str, parent, attrs: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(64):016x}"
+        self.span_id = f"{random.getrandbits(32):08x}"
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+        self.status = "ok"
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a pipeline stage, e.g. `with span("cse.request", page=2) as s: ...; s.set(items=10)`.
+    Nested spans share the trace ID of the outermost one. A span that exits
+    with an exception gets status "error" (the exception propagates). A
+    `cache_hit` attribute is also counted per span name.
+    """
+    if not TELEMETRY:
+        yield _NOOP
+        return
+    s = Span(name, _current.get(), attrs)
+    token = _current.set(s)
+    try:
+        yield s
+    except GeneratorExit:
+        # A streaming consumer stopped early
+        s.status = "cancelled"
+        raise
+    except BaseException as e:
+        s.status = "error"
+        s.attrs.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # generator closed from another context
+        s.duration = time.perf_counter() - s.started
+        _record(s)
+
+
+def traced(name: str, result_attrs=None):
+    """
+    Decorator running the function in a span. `result_attrs(result)` returns
+    attributes taken from the return value. Generator functions are traced
+    until exhausted: the span gets `first_event_ms`, and the result is the
+    "result" of the last {"event": "done", "result": ...} event.
+    """
+    def decorate(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def stream(*args, **kwargs):
+                with span(name) as s:
+                    started = time.perf_counter()
+                    first = True
+                    for event in fn(*args, **kwargs):
+                        if first:
+                            s.set(first_event_ms=round((time.perf_counter() - started) * 1000, 2))
+                            first = False
+                        if result_attrs and isinstance(event, dict) and "result" in event:
+                            s.set(**result_attrs(event["result"]))
+                        yield event
+            return stream
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            with span(name) as s:
+                result = fn(*args, **kwargs)
+                if result_attrs:
+                    s.set(**result_attrs(result))
+                return result
+        return call
+    return decorate
+
+
+def annotate(**attrs) -> None:
+    """Set attributes on the innermost active span, if any."""
+    s = _current.get()
+    if s is not None:
+        s.set(**attrs)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """Add to a counter, exposed as <prefix>_<name>{labels}."""
+    if not TELEMETRY:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def _observe(key: tuple, seconds: float) -> None:
+    with _lock:
+        row = _histograms.get(key)
+        if row is None:
+            row = _histograms[key] = [0] * (len(DURATION_BUCKETS) + 2)
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                row[i] += 1
+                break
+        else:
+            row[len(DURATION_BUCKETS)] += 1
+        row[-1] += seconds
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    """Add a duration to a histogram, exposed as <prefix>_<name>{labels} with DURATION_BUCKETS."""
+    if not TELEMETRY:
+        return
+    _observe((name, tuple(sorted(labels.items()))), seconds)
+
+
+def _record(s: Span) -> None:
+    _observe(("span_duration_seconds", (("span", s.name), ("status", s.status))), s.duration)
+    if "cache_hit" in s.attrs:
+        count("span_cache_lookups_total", span=s.name, hit=str(bool(s.attrs["cache_hit"])).lower())
+    if TRACE_LOG:
+        print(json.dumps({
+            "ts": round(time.time(), 3),
+            "span": s.name,
+            "trace_id": s.trace_id,
+            "span_id": s.span_id,
+            "parent_id": s.parent_id,
+            "status": s.status,
+            "duration_ms": round(s.duration * 1000, 2),
+            **s.attrs,
+        }, default=str))
+
+
+def _labels(items) -> str:
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{k}="{escape(v)}"' for k, v in items)
+
+
+def metrics_text() -> str:
+    """All histograms and counters in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    typed = set()
+    for (histogram, items), row in sorted(histograms.items()):
+        name = f"{METRICS_PREFIX}_{histogram}"
+        if name not in typed:
+            typed.add(name)
+            if histogram == "span_duration_seconds":
+                lines.append(f"# HELP {name} Duration of pipeline stages.")
+            lines.append(f"# TYPE {name} histogram")
+        labels = _labels(items)
+        le = labels + "," if labels else ""
+        cumulative = 0
+        for bound, n in zip(DURATION_BUCKETS, row):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{le}le="{bound}"}} {cumulative}')
+        cumulative += row[len(DURATION_BUCKETS)]
+        lines.append(f'{name}_bucket{{{le}le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {row[-1]:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+    for (counter, labels), value in sorted(counters.items()):
+        metric = f"{METRICS_PREFIX}_{counter}"
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{{{_labels(labels)}}} {value:g}" if labels else f"{metric} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """Serve /metrics on a daemon thread, once per process. No-op without a port."""
+    global _metrics_server
+    port = port or METRICS_PORT
+    if not port or not TELEMETRY:
+        return None
+    with _lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            except OSError as e:
+                print(f"Metrics server not started on port {port}: {e}")
+                _metrics_server = False
+                return None
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics", daemon=True).start()
+            print(f"Serving metrics on :{port}/metrics")
+    return _metrics_server or None